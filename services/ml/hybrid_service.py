@@ -7,36 +7,98 @@ Based on existing quantum circuits + time-series templates
 
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple, Any, Union
 from dataclasses import dataclass
 from enum import Enum
 import asyncio
+import importlib.util
+import io
+import json
 import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import math
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from collections import OrderedDict, deque
+from collections.abc import Sequence
 
-# ML Libraries
-try:
-    import lightgbm as lgb
-    import xgboost as xgb
-    from sklearn.preprocessing import StandardScaler, LabelEncoder
-    from sklearn.metrics import mean_absolute_percentage_error, mean_squared_error
-    from sklearn.model_selection import TimeSeriesSplit
-    HAS_CLASSICAL_ML = True
-except ImportError:
-    HAS_CLASSICAL_ML = False
+# ML and quantum backends are heavy to import, so module load only checks
+# they are installed; each is imported the first time a model type needs it
+# (or eagerly through preload_backends).
+CLASSICAL_BACKENDS = ('lightgbm', 'xgboost', 'sklearn')
+QUANTUM_BACKENDS = ('qiskit', 'qiskit_aer')
+
+def _backends_installed(names: Tuple[str, ...]) -> bool:
+    return all(importlib.util.find_spec(name) is not None for name in names)
+
+HAS_CLASSICAL_ML = _backends_installed(CLASSICAL_BACKENDS)
+if not HAS_CLASSICAL_ML:
     logging.warning("Classical ML libraries not available")
 
-# Quantum Libraries  
-try:
-    from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-    from qiskit.circuit.library import RealAmplitudes
-    from qiskit_aer import AerSimulator
-    from qiskit.algorithms.optimizers import COBYLA
-    HAS_QUANTUM = True
-except ImportError:
-    HAS_QUANTUM = False
+HAS_QUANTUM = _backends_installed(QUANTUM_BACKENDS)
+if not HAS_QUANTUM:
     logging.warning("Quantum libraries not available")
 
+# Bound by _load_classical_backend / _load_quantum_backend
+lgb = None
+xgb = None
+StandardScaler = None
+mean_absolute_percentage_error = None
+TimeSeriesSplit = None
+QuantumCircuit = None
+QuantumRegister = None
+ClassicalRegister = None
+RealAmplitudes = None
+AerSimulator = None
+transpile = None
+
+_backend_lock = threading.Lock()
+
+def _load_classical_backend():
+    """Import LightGBM, XGBoost and scikit-learn into the module namespace"""
+    global lgb, xgb, StandardScaler, mean_absolute_percentage_error, TimeSeriesSplit
+    if lgb is not None:
+        return
+    
+    with _backend_lock:
+        if lgb is not None:
+            return
+        try:
+            import xgboost as xgb
+            from sklearn.preprocessing import StandardScaler
+            from sklearn.metrics import mean_absolute_percentage_error
+            from sklearn.model_selection import TimeSeriesSplit
+            import lightgbm as lgb  # Last: it is the "already loaded" marker
+        except ImportError as e:
+            raise ImportError(f"Classical ML libraries required but not available: {e}")
+
+def _load_quantum_backend():
+    """Import Qiskit and Qiskit Aer into the module namespace"""
+    global QuantumCircuit, QuantumRegister, ClassicalRegister, RealAmplitudes, AerSimulator, transpile
+    if QuantumCircuit is not None:
+        return
+    
+    with _backend_lock:
+        if QuantumCircuit is not None:
+            return
+        try:
+            from qiskit import QuantumRegister, ClassicalRegister, transpile
+            try:
+                # Function form; the RealAmplitudes class is deprecated since Qiskit 2.1
+                from qiskit.circuit.library import real_amplitudes as RealAmplitudes
+            except ImportError:
+                from qiskit.circuit.library import RealAmplitudes
+            from qiskit_aer import AerSimulator
+            from qiskit import QuantumCircuit  # Last: it is the "already loaded" marker
+        except ImportError as e:
+            raise ImportError(f"Quantum libraries not available: {e}")
+
 class MLModelType(Enum):
     CLASSICAL_ONLY = "classical"
     QUANTUM_ONLY = "quantum" 
@@ -48,6 +110,24 @@ class ForecastHorizon(Enum):
     MONTHLY = "monthly"
     QUARTERLY = "quarterly"
 
+def preload_backends(model_type: MLModelType = MLModelType.HYBRID) -> Dict[str, float]:
+    """
+    Import the backends `model_type` needs now instead of on first use
+    
+    For servers that prefer paying the import cost at startup; returns the
+    seconds spent per backend.
+    """
+    timings = {}
+    if model_type in [MLModelType.CLASSICAL_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
+        start = time.perf_counter()
+        _load_classical_backend()
+        timings['classical'] = time.perf_counter() - start
+    if model_type in [MLModelType.QUANTUM_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
+        start = time.perf_counter()
+        _load_quantum_backend()
+        timings['quantum'] = time.perf_counter() - start
+    return timings
+
 @dataclass
 class PUPPrediction:
     """PUP prediction result"""
@@ -61,41 +141,716 @@ class PUPPrediction:
     quantum_optimization: Optional[float] = None
     model_type: str = "hybrid"
     features_importance: Optional[Dict[str, float]] = None
-    quantum_states: Optional[List[str]] = None
+    quantum_states: Optional[Sequence] = None
     mape: Optional[float] = None
     
+class QuantumStates(Sequence):
+    """
+    Lazy view over one row of the state-probability matrix (in percent).
+    The "|00⟩: 12.34%" labels are only rendered when read or serialized.
+    """
+    
+    LABELS = ("|00⟩", "|01⟩", "|10⟩", "|11⟩")
+    
+    __slots__ = ('probabilities',)
+    
+    def __init__(self, probabilities: np.ndarray):
+        self.probabilities = probabilities
+    
+    def __len__(self) -> int:
+        return len(self.probabilities)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return f"{self.LABELS[index]}: {self.probabilities[index]:.2f}%"
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (QuantumStates, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return repr(list(self))
+    
+    def to_list(self) -> List[str]:
+        return list(self)
+    
+def _scalar(value: Any) -> Any:
+    """Plain Python value for a NumPy scalar, so rows stay JSON-serializable"""
+    return value.item() if isinstance(value, np.generic) else value
+
+class PredictionRow:
+    """Lazy view of one row of a PredictionBatch, with the same attributes as PUPPrediction"""
+    
+    __slots__ = ('batch', 'index')
+    
+    mape = None
+    
+    def __init__(self, batch: 'PredictionBatch', index: int):
+        self.batch = batch
+        self.index = index
+    
+    @property
+    def material_number(self) -> str:
+        return _scalar(self.batch.material_number[self.index])
+    
+    @property
+    def company_code(self) -> str:
+        return _scalar(self.batch.company_code[self.index])
+    
+    @property
+    def plant(self) -> str:
+        return _scalar(self.batch.plant[self.index])
+    
+    @property
+    def period(self) -> str:
+        return _scalar(self.batch.period[self.index])
+    
+    @property
+    def predicted_pup(self) -> float:
+        return _scalar(self.batch.predicted_pup[self.index])
+    
+    @property
+    def confidence_interval(self) -> Tuple[float, float]:
+        return (_scalar(self.batch.ci_lower[self.index]), _scalar(self.batch.ci_upper[self.index]))
+    
+    @property
+    def classical_prediction(self) -> Optional[float]:
+        if self.batch.classical_prediction is None:
+            return None
+        return _scalar(self.batch.classical_prediction[self.index])
+    
+    @property
+    def quantum_optimization(self) -> Optional[float]:
+        if self.batch.quantum_optimization is None:
+            return None
+        return _scalar(self.batch.quantum_optimization[self.index])
+    
+    @property
+    def model_type(self) -> str:
+        return self.batch.model_type
+    
+    @property
+    def quantum_states(self) -> Optional[QuantumStates]:
+        if self.batch.quantum_probabilities is None:
+            return None
+        return QuantumStates(self.batch.quantum_probabilities[self.index])
+    
+    @property
+    def features_importance(self) -> Optional[Dict[str, float]]:
+        return self.batch.features_importance if self.classical_prediction else None
+    
+    def to_prediction(self) -> PUPPrediction:
+        return PUPPrediction(
+            material_number=self.material_number,
+            company_code=self.company_code,
+            plant=self.plant,
+            period=self.period,
+            predicted_pup=self.predicted_pup,
+            confidence_interval=self.confidence_interval,
+            classical_prediction=self.classical_prediction,
+            quantum_optimization=self.quantum_optimization,
+            model_type=self.model_type,
+            quantum_states=self.quantum_states,
+            features_importance=self.features_importance
+        )
+
+@dataclass
+class PredictionBatch:
+    """
+    Columnar PUP prediction results: one array per field, one row per input record.
+    Feature importance and model type are stored once for the whole batch.
+    """
+    material_number: np.ndarray
+    company_code: np.ndarray
+    plant: np.ndarray
+    period: np.ndarray
+    predicted_pup: np.ndarray
+    ci_lower: np.ndarray
+    ci_upper: np.ndarray
+    model_type: str
+    classical_prediction: Optional[np.ndarray] = None
+    quantum_optimization: Optional[np.ndarray] = None
+    quantum_probabilities: Optional[np.ndarray] = None  # (n, 4), percent
+    features_importance: Optional[Dict[str, float]] = None
+    source_index: Optional[np.ndarray] = None  # Input row position of each result row
+    
+    def __len__(self) -> int:
+        return len(self.predicted_pup)
+    
+    def __getitem__(self, index: int) -> PredictionRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PredictionBatch index out of range")
+        return PredictionRow(self, index)
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield PredictionRow(self, index)
+    
+    def take(self, rows: Union[slice, np.ndarray]) -> 'PredictionBatch':
+        """Sub-batch of the given rows (slice or index array)"""
+        def column(values: Optional[np.ndarray]) -> Optional[np.ndarray]:
+            return values[rows] if values is not None else None
+        
+        return PredictionBatch(
+            material_number=self.material_number[rows],
+            company_code=self.company_code[rows],
+            plant=self.plant[rows],
+            period=self.period[rows],
+            predicted_pup=self.predicted_pup[rows],
+            ci_lower=self.ci_lower[rows],
+            ci_upper=self.ci_upper[rows],
+            model_type=self.model_type,
+            classical_prediction=column(self.classical_prediction),
+            quantum_optimization=column(self.quantum_optimization),
+            quantum_probabilities=column(self.quantum_probabilities),
+            features_importance=self.features_importance,
+            source_index=column(self.source_index)
+        )
+    
+    def to_predictions(self) -> List[PUPPrediction]:
+        """Materialize one PUPPrediction per row (legacy result format)"""
+        return [row.to_prediction() for row in self]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact JSON-ready response: column lists plus per-batch metadata"""
+        def column(values: Optional[np.ndarray]) -> Optional[List]:
+            return values.tolist() if values is not None else None
+        
+        has_states = self.quantum_probabilities is not None and self.quantum_probabilities.shape[1] > 0
+        
+        return {
+            'count': len(self),
+            'model_type': self.model_type,
+            'features_importance': self.features_importance if self.classical_prediction is not None else None,
+            'quantum_state_labels': list(QuantumStates.LABELS) if has_states else None,
+            'columns': {
+                'material_number': column(self.material_number),
+                'company_code': column(self.company_code),
+                'plant': column(self.plant),
+                'period': column(self.period),
+                'predicted_pup': column(self.predicted_pup),
+                'ci_lower': column(self.ci_lower),
+                'ci_upper': column(self.ci_upper),
+                'classical_prediction': column(self.classical_prediction),
+                'quantum_optimization': column(self.quantum_optimization),
+                'quantum_probabilities': column(self.quantum_probabilities) if has_states else None
+            }
+        }
+    
+class CategoryVocabulary:
+    """
+    Category to code mapping for the categorical features
+    
+    Backed by a pandas hash index so whole columns are encoded in one
+    vectorized lookup. Fitting assigns codes like LabelEncoder (sorted
+    classes); unseen values encode to -1.
+    """
+    
+    def __init__(self, classes: Optional[List[str]] = None):
+        self.classes_ = np.asarray(classes if classes is not None else [], dtype=object)
+        self._index = pd.Index(self.classes_)
+        
+    def fit_transform(self, values: pd.Series) -> np.ndarray:
+        codes, distinct = self._factorize_str(values)
+        self.classes_ = np.asarray(sorted(set(distinct)), dtype=object)
+        self._index = pd.Index(self.classes_)
+        return self._index.get_indexer(distinct)[codes].astype(np.int64)
+        
+    def transform(self, values: pd.Series) -> np.ndarray:
+        codes, distinct = self._factorize_str(values)
+        return self._index.get_indexer(distinct)[codes].astype(np.int64)
+        
+    def extend(self, values: pd.Series) -> int:
+        """Append unseen values as new codes, leaving existing codes unchanged; returns how many were added"""
+        _, distinct = self._factorize_str(values)
+        unseen = sorted(value for value, code in zip(distinct, self._index.get_indexer(distinct)) if code < 0)
+        if unseen:
+            self.classes_ = np.concatenate([self.classes_, np.asarray(unseen, dtype=object)])
+            self._index = pd.Index(self.classes_)
+        return len(unseen)
+        
+    @staticmethod
+    def _factorize_str(values: pd.Series) -> Tuple[np.ndarray, List[str]]:
+        """Row codes into the str() of each distinct value, converting each distinct value once"""
+        codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+        return codes, [str(value) for value in uniques]
+        
+    def __len__(self) -> int:
+        return len(self.classes_)
+
+class PredictionCache:
+    """
+    LRU + TTL cache of per-row prediction results
+    
+    Keys pair the model version with a 64-bit fingerprint of the row's
+    prepared features (pd.util.hash_pandas_object), so rows are reused
+    whatever request they arrive in, and a new model version never sees
+    the previous model's entries. Lookups and inserts are bulk.
+    """
+    
+    def __init__(self, max_entries: int = 100_000, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+    @staticmethod
+    def fingerprint(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+        return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+        
+    def get_many(self, model_version: str, fingerprints: np.ndarray) -> Tuple[np.ndarray, List[Optional[np.ndarray]]]:
+        """Hit mask plus the cached result row (or None) for every fingerprint"""
+        found = np.zeros(len(fingerprints), dtype=bool)
+        values: List[Optional[np.ndarray]] = [None] * len(fingerprints)
+        now = time.monotonic()
+        
+        with self._lock:
+            for i, fingerprint in enumerate(fingerprints.tolist()):
+                key = (model_version, fingerprint)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                stored_at, value = entry
+                if now - stored_at > self.ttl:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[i] = True
+                values[i] = value
+            
+            hits = int(found.sum())
+            self.hits += hits
+            self.misses += len(fingerprints) - hits
+        
+        return found, values
+        
+    def put_many(self, model_version: str, fingerprints: np.ndarray, values: np.ndarray):
+        now = time.monotonic()
+        with self._lock:
+            for fingerprint, value in zip(fingerprints.tolist(), values):
+                key = (model_version, fingerprint)
+                self._entries[key] = (now, value.copy())
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            
+    def __len__(self) -> int:
+        return len(self._entries)
+        
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+class _GroupState:
+    """Ring buffer of one group's latest observations plus running window sums"""
+    
+    __slots__ = ('periods', 'pups', 'quantities', 'counts', 'sums', 'squares', 'pushes')
+    
+    def __init__(self, capacity: int, n_windows: int):
+        self.periods = deque(maxlen=capacity)
+        self.pups = deque(maxlen=capacity)
+        self.quantities = deque(maxlen=capacity)
+        # Per window w: statistics of the last w - 1 stored pups, i.e. the
+        # part of the next record's window that is already known
+        self.counts = [0] * n_windows
+        self.sums = [0.0] * n_windows
+        self.squares = [0.0] * n_windows
+        self.pushes = 0
+
+class GroupFeatureStore:
+    """
+    Streaming lag/rolling feature state per material/company/plant
+    
+    Keeps each group's last observations in a ring buffer with running
+    window sums, so the lag and rolling features of the group's next record
+    cost O(1) instead of resending and re-scanning its history. Features
+    match prepare_features for a record appended after the stored periods.
+    """
+    
+    SNAPSHOT_VERSION = 1
+    
+    def __init__(self, lags: Optional[List[int]] = None, windows: Optional[List[int]] = None):
+        self.lags = list(lags or SAPienceMLService.LAGS)
+        self.windows = list(windows or SAPienceMLService.ROLLING_WINDOWS)
+        self.capacity = max(max(self.lags), max(self.windows))
+        self._groups: Dict[Tuple[str, str, str], _GroupState] = {}
+        
+    def __len__(self) -> int:
+        return len(self._groups)
+        
+    @staticmethod
+    def _key(material: Any, company_code: Any, plant: Any) -> Tuple[str, str, str]:
+        return (str(material), str(company_code), str(plant))
+        
+    def update(self, record: Dict[str, Any]):
+        """
+        Append one period's observation to its group
+        
+        Re-sending the latest period replaces it; older periods are rejected.
+        """
+        key = self._key(record['material'], record['company_code'], record['plant'])
+        state = self._groups.get(key)
+        if state is None:
+            state = self._groups[key] = _GroupState(self.capacity, len(self.windows))
+        
+        period = str(record['period'])
+        if state.periods and period <= state.periods[-1]:
+            if period < state.periods[-1]:
+                raise ValueError(f"Out-of-order period {period} for {key}; latest is {state.periods[-1]}")
+            state.periods.pop()
+            state.pups.pop()
+            state.quantities.pop()
+            self._resync(state)
+        
+        pup = float(record['current_pup'])
+        state.periods.append(period)
+        state.pups.append(pup)
+        state.quantities.append(float(record['quantity']))
+        state.pushes += 1
+        
+        # Running sums drift with add/remove; recompute exactly once per buffer turnover
+        if state.pushes % self.capacity == 0:
+            self._resync(state)
+            return
+        
+        for i, window in enumerate(self.windows):
+            self._accumulate(state, i, pup, 1)
+            if len(state.pups) >= window:
+                self._accumulate(state, i, state.pups[-window], -1)
+                
+    def update_frame(self, df: pd.DataFrame):
+        """Append many observations, in period order within each group"""
+        ordered = df.sort_values('period', kind='stable')
+        for record in ordered[['material', 'company_code', 'plant', 'period', 'current_pup', 'quantity']].to_dict('records'):
+            self.update(record)
+            
+    @staticmethod
+    def _accumulate(state: _GroupState, i: int, value: float, sign: int):
+        if not math.isnan(value):
+            state.counts[i] += sign
+            state.sums[i] += sign * value
+            state.squares[i] += sign * value * value
+            
+    def _resync(self, state: _GroupState):
+        pups = list(state.pups)
+        for i, window in enumerate(self.windows):
+            known = [v for v in pups[len(pups) - (window - 1):] if not math.isnan(v)] if window > 1 else []
+            state.counts[i] = len(known)
+            state.sums[i] = sum(known)
+            state.squares[i] = sum(v * v for v in known)
+            
+    def features(self, record: Dict[str, Any]) -> Dict[str, float]:
+        """Lag/rolling features for a group's next record, in prepare_features column order"""
+        state = self._groups.get(self._key(record['material'], record['company_code'], record['plant']))
+        return self._features(state, float(record['current_pup']))
+        
+    def _features(self, state: Optional[_GroupState], pup: float) -> Dict[str, float]:
+        n_stored = len(state.pups) if state is not None else 0
+        
+        features = {}
+        for lag in self.lags:
+            features[f'pup_lag_{lag}'] = state.pups[-lag] if lag <= n_stored else np.nan
+            features[f'quantity_lag_{lag}'] = state.quantities[-lag] if lag <= n_stored else np.nan
+        
+        for i, window in enumerate(self.windows):
+            count, total, squares = (state.counts[i], state.sums[i], state.squares[i]) if state is not None else (0, 0.0, 0.0)
+            if not math.isnan(pup):
+                count += 1
+                total += pup
+                squares += pup * pup
+            mean = total / count if count > 0 else np.nan
+            if count > 1:
+                std = math.sqrt(max(squares - count * mean * mean, 0.0) / (count - 1))
+            else:
+                std = np.nan
+            features[f'pup_rolling_mean_{window}'] = mean
+            features[f'pup_rolling_std_{window}'] = std
+        
+        return features
+        
+    def features_for(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Lag/rolling feature columns for a frame of new records
+        
+        Each row is treated as its group's next period after the stored
+        state (the frame's own rows do not feed each other).
+        """
+        keys = zip(df['material'].astype(str), df['company_code'].astype(str), df['plant'].astype(str))
+        pups = df['current_pup'].to_numpy(dtype=np.float64)
+        
+        rows = [self._features(self._groups.get(key), pup) for key, pup in zip(keys, pups)]
+        columns = self._features(None, np.nan).keys()
+        return {col: np.array([row[col] for row in rows], dtype=np.float64) for col in columns}
+        
+    def save(self, path: str):
+        """Snapshot the buffers to a JSON file (running sums are rebuilt on load)"""
+        snapshot = {
+            'version': self.SNAPSHOT_VERSION,
+            'lags': self.lags,
+            'windows': self.windows,
+            'groups': [
+                [list(key), list(state.periods), list(state.pups), list(state.quantities)]
+                for key, state in self._groups.items()
+            ]
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+        
+    @classmethod
+    def load(cls, path: str) -> 'GroupFeatureStore':
+        with open(path) as f:
+            snapshot = json.load(f)
+        
+        if snapshot.get('version') != cls.SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported feature store snapshot: {snapshot.get('version')}")
+        
+        store = cls(snapshot['lags'], snapshot['windows'])
+        for key, periods, pups, quantities in snapshot['groups']:
+            state = store._groups[tuple(key)] = _GroupState(store.capacity, len(store.windows))
+            state.periods.extend(periods)
+            state.pups.extend(float(v) if v is not None else np.nan for v in pups)
+            state.quantities.extend(float(v) if v is not None else np.nan for v in quantities)
+            state.pushes = len(periods)
+            store._resync(state)
+        return store
+
+# Cross-validation fold workers; module level so a process pool can run them.
+# The training matrices are shipped once per worker through the initializer.
+_cv_data: Dict[str, np.ndarray] = {}
+
+def _init_cv_worker(X: np.ndarray, X_scaled: np.ndarray, y: np.ndarray):
+    _load_classical_backend()
+    _cv_data.update(X=X, X_scaled=X_scaled, y=y)
+
+def _lightgbm_cv_fold(
+    params: Dict[str, Any],
+    train_idx: np.ndarray,
+    val_idx: np.ndarray,
+    num_boost_round: int,
+    early_stopping_rounds: int
+) -> Tuple[float, int]:
+    """Train one LightGBM fold; returns (validation MAPE, best iteration)"""
+    X, y = _cv_data['X'], _cv_data['y']
+    
+    train_data = lgb.Dataset(X[train_idx], label=y[train_idx])
+    val_data = lgb.Dataset(X[val_idx], label=y[val_idx], reference=train_data)
+    
+    model = lgb.train(
+        params,
+        train_data,
+        valid_sets=[val_data],
+        num_boost_round=num_boost_round,
+        callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False), lgb.log_evaluation(0)]
+    )
+    
+    val_pred = model.predict(X[val_idx])
+    return mean_absolute_percentage_error(y[val_idx], val_pred), model.best_iteration or num_boost_round
+
+def _xgboost_cv_fold(
+    params: Dict[str, Any],
+    train_idx: np.ndarray,
+    val_idx: np.ndarray,
+    num_boost_round: int,
+    early_stopping_rounds: int
+) -> Tuple[float, int]:
+    """Train one XGBoost fold on the scaled features; returns (validation MAPE, best iteration)"""
+    X, y = _cv_data['X_scaled'], _cv_data['y']
+    
+    model = xgb.XGBRegressor(**params, n_estimators=num_boost_round, early_stopping_rounds=early_stopping_rounds)
+    model.fit(
+        X[train_idx], y[train_idx],
+        eval_set=[(X[val_idx], y[val_idx])],
+        verbose=False
+    )
+    
+    val_pred = model.predict(X[val_idx])
+    return mean_absolute_percentage_error(y[val_idx], val_pred), model.best_iteration + 1
+
+class LazyModelStore(dict):
+    """
+    classical_models dict whose heavy entries are loaded on first access
+    
+    Loaders are keyed like the models they produce; each runs at most once.
+    """
+    
+    def __init__(self, values: Dict[str, Any], loaders: Dict[str, Callable[[], Any]]):
+        super().__init__(values)
+        self._loaders = dict(loaders)
+        self._lock = threading.Lock()
+        
+    def __missing__(self, key: str) -> Any:
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+            if key not in self._loaders:
+                raise KeyError(key)
+            value = self._loaders.pop(key)()
+            self[key] = value
+            return value
+        
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or key in self._loaders
+        
+    def __setitem__(self, key: str, value: Any):
+        self._loaders.pop(key, None)
+        super().__setitem__(key, value)
+        
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+        
+    def preload(self):
+        """Load every pending entry now"""
+        for key in list(self._loaders):
+            self[key]
+
+@dataclass
+class CompiledCircuit:
+    """
+    Parameterized circuit transpiled once for its simulator, see compile_quantum_circuit.
+    Shared by every caller of the cache: treat it as read-only.
+    """
+    circuit: Any
+    transpiled: Any
+    parameters: List[Any]
+    simulator: Any
+    transpile_seconds: float
+
 class SAPienceMLService:
     """
     Hybrid ML service combining classical forecasting with quantum optimization
     """
     
-    def __init__(self, model_type: MLModelType = MLModelType.HYBRID):
+    # Time-series feature layout
+    GROUP_COLS = ['material', 'company_code', 'plant']
+    REQUIRED_COLS = ['material', 'current_pup', 'standard_price', 'quantity', 'period']
+    NUMERIC_COLS = ['current_pup', 'standard_price', 'quantity']
+    # Optional column keeping merged requests' groups apart (see PredictionCoalescer)
+    PARTITION_COL = '_partition'
+    LAGS = [1, 2, 3, 6, 12]
+    ROLLING_WINDOWS = [3, 6, 12]
+    HISTORY_LENGTH = max(max(LAGS), max(ROLLING_WINDOWS))
+    
+    # Classical model training
+    LIGHTGBM_PARAMS = {
+        'objective': 'regression',
+        'metric': 'mape',
+        'boosting_type': 'gbdt',
+        'num_leaves': 31,
+        'learning_rate': 0.05,
+        'feature_fraction': 0.9,
+        'bagging_fraction': 0.8,
+        'bagging_freq': 5,
+        'verbose': 0
+    }
+    XGBOOST_PARAMS = {
+        'objective': 'reg:squarederror',
+        'eval_metric': 'mape',
+        'max_depth': 6,
+        'learning_rate': 0.05,
+        'subsample': 0.8,
+        'colsample_bytree': 0.8,
+        'random_state': 42
+    }
+    CV_SPLITS = 5
+    MAX_BOOST_ROUNDS = 1000
+    EARLY_STOPPING_ROUNDS = 100
+    UPDATE_BOOST_ROUNDS = 100
+    
+    # Quantum circuit execution
+    QUANTUM_REPS = 2
+    QUANTUM_SHOTS = 1024
+    QUANTUM_MAX_BINDINGS = 10_000  # Parameter bindings per simulator job
+    
+    # Model artifact layout
+    ARTIFACT_FORMAT_VERSION = 1
+    ARTIFACT_MANIFEST = 'manifest.json'
+    ARTIFACT_LATEST = 'LATEST'
+    LIGHTGBM_FILE = 'lightgbm.txt'
+    XGBOOST_FILE = 'xgboost.ubj'
+    HISTORY_FILE = 'history.json'
+    
+    def __init__(
+        self,
+        model_type: MLModelType = MLModelType.HYBRID,
+        cv_workers: Optional[int] = None,
+        lightgbm_threads: Optional[int] = None,
+        xgboost_threads: Optional[int] = None,
+        quantum_shots: Optional[int] = None
+    ):
         self.model_type = model_type
+        self.cv_workers = cv_workers  # Fold processes; default one per CPU (max one per fold)
+        self.lightgbm_threads = lightgbm_threads  # Per model; default splits the CPUs across workers
+        self.xgboost_threads = xgboost_threads
         self.classical_models = {}
-        self.quantum_circuits = {}
+        self.quantum_circuits: Dict[Tuple[int, int], CompiledCircuit] = {}  # Keyed by (n_qubits, reps)
+        self.quantum_shots = quantum_shots or self.QUANTUM_SHOTS
+        self.quantum_telemetry = {
+            'circuits_compiled': 0,
+            'transpile_seconds': 0.0,
+            'jobs': 0,
+            'bindings': 0,
+            'shots': 0,
+            'simulate_seconds': 0.0
+        }
+        self._circuit_lock = threading.Lock()
         self.scalers = {}
         self.feature_encoders = {}
         self.is_trained = False
+        self.model_version: Optional[str] = None
         
-        # Verify capabilities
+        # Optional per-row result cache, see predict_pup_batch
+        self.prediction_cache: Optional[PredictionCache] = None
+        
+        # Last HISTORY_LENGTH raw rows per group, enough to rebuild lag/rolling features in update()
+        self.history_tail: Optional[pd.DataFrame] = None
+        self._history_path: Optional[str] = None
+        
+        # Verify capabilities; Qiskit itself is only imported once a circuit is built
         if model_type in [MLModelType.CLASSICAL_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
             if not HAS_CLASSICAL_ML:
                 raise ImportError("Classical ML libraries required but not available")
+            _load_classical_backend()
                 
         if model_type in [MLModelType.QUANTUM_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
             if not HAS_QUANTUM:
                 raise ImportError("Quantum libraries required but not available")
     
-    def prepare_features(self, sap_data: List[Dict[str, Any]]) -> pd.DataFrame:
+    def prepare_features(
+        self,
+        sap_data: Union[List[Dict[str, Any]], Dict[str, np.ndarray], pd.DataFrame],
+        feature_store: Optional[GroupFeatureStore] = None
+    ) -> pd.DataFrame:
         """
         Feature engineering for SAP PUP data
         Based on your existing SAP structure
+        
+        Accepts processed records, or columns from
+        SAPDataProcessor.get_monthly_pup_columns without a per-row detour.
+        With a feature_store, lag/rolling features come from the stored group
+        state, so only the new periods need to be sent.
         """
         df = pd.DataFrame(sap_data)
         
         # Ensure required columns
-        required_cols = ['material', 'current_pup', 'standard_price', 'quantity', 'period']
-        missing_cols = [col for col in required_cols if col not in df.columns]
+        missing_cols = [col for col in self.REQUIRED_COLS if col not in df.columns]
         if missing_cols:
             raise ValueError(f"Missing required columns: {missing_cols}")
         
@@ -113,40 +868,89 @@ class SAPienceMLService:
         df['year'] = df['period_dt'].dt.year
         
         # Lag features (for time series)
-        df = df.sort_values(['material', 'company_code', 'plant', 'period_dt'])
+        sort_cols = self._group_keys(df) + ['period_dt']
+        df = df.sort_values(sort_cols)
         
-        for lag in [1, 2, 3, 6, 12]:
-            df[f'pup_lag_{lag}'] = df.groupby(['material', 'company_code', 'plant'])['current_pup'].shift(lag)
-            df[f'quantity_lag_{lag}'] = df.groupby(['material', 'company_code', 'plant'])['quantity'].shift(lag)
-        
-        # Rolling statistics
-        for window in [3, 6, 12]:
-            df[f'pup_rolling_mean_{window}'] = (
-                df.groupby(['material', 'company_code', 'plant'])['current_pup']
-                .rolling(window=window, min_periods=1).mean().reset_index(0, drop=True)
-            )
-            df[f'pup_rolling_std_{window}'] = (
-                df.groupby(['material', 'company_code', 'plant'])['current_pup']
-                .rolling(window=window, min_periods=1).std().reset_index(0, drop=True)
-            )
+        # Lags and rolling statistics in one pass over a shared group index
+        if feature_store is not None:
+            df = df.assign(**feature_store.features_for(df))
+        else:
+            df = df.assign(**self._lag_rolling_features(df))
         
         # Categorical encoding
         for col in ['material', 'company_code', 'plant']:
             if col not in self.feature_encoders:
-                self.feature_encoders[col] = LabelEncoder()
-                df[f'{col}_encoded'] = self.feature_encoders[col].fit_transform(df[col].astype(str))
+                self.feature_encoders[col] = CategoryVocabulary()
+                df[f'{col}_encoded'] = self.feature_encoders[col].fit_transform(df[col])
             else:
-                # Handle unseen categories
-                known_categories = set(self.feature_encoders[col].classes_)
-                df[f'{col}_encoded'] = df[col].apply(
-                    lambda x: self.feature_encoders[col].transform([str(x)])[0] 
-                    if str(x) in known_categories else -1
-                )
+                # Unseen categories encode to -1
+                df[f'{col}_encoded'] = self.feature_encoders[col].transform(df[col])
         
         return df
     
+    def _group_keys(self, df: pd.DataFrame) -> List[str]:
+        """Series keys; a partition column, when present, splits otherwise equal groups"""
+        if self.PARTITION_COL in df.columns:
+            return [self.PARTITION_COL] + self.GROUP_COLS
+        return list(self.GROUP_COLS)
+    
+    def _lag_rolling_features(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Per-group lag and rolling features for a frame sorted by group and period
+        
+        Computes one group index, then for each offset k gathers the value k
+        rows back when it lies in the same group. Lags are those gathers;
+        rolling mean/std (min_periods=1, ddof=1, NaN-skipping like pandas)
+        are accumulated from them in two passes for numerical stability.
+        Column names and order match the former groupby/shift/rolling code.
+        """
+        n = len(df)
+        positions = np.arange(n)
+        
+        # Sorted by group keys, so each group is one contiguous run
+        group_ids = df.groupby(self._group_keys(df), sort=False).ngroup().to_numpy(dtype=np.float64)
+        has_group = ~np.isnan(group_ids)
+        new_group = np.ones(n, dtype=bool)
+        new_group[1:] = group_ids[1:] != group_ids[:-1]
+        group_starts = np.maximum.accumulate(np.where(new_group, positions, 0))
+        
+        pup = df['current_pup'].to_numpy(dtype=np.float64)
+        quantity = df['quantity'].to_numpy(dtype=np.float64)
+        
+        def back(values: np.ndarray, k: int) -> np.ndarray:
+            source = positions - k
+            in_group = has_group & (source >= group_starts)
+            return np.where(in_group, values[np.maximum(source, 0)], np.nan)
+            
+        max_offset = max(max(self.LAGS), max(self.ROLLING_WINDOWS) - 1)
+        pup_back = {k: back(pup, k) for k in range(max_offset + 1)}
+        
+        features = {}
+        for lag in self.LAGS:
+            features[f'pup_lag_{lag}'] = pup_back[lag]
+            features[f'quantity_lag_{lag}'] = back(quantity, lag)
+            
+        for window in self.ROLLING_WINDOWS:
+            window_values = [pup_back[k] for k in range(window)]
+            counts = sum((~np.isnan(v)).astype(np.int64) for v in window_values)
+            sums = sum(np.nan_to_num(v) for v in window_values)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(counts > 0, sums / counts, np.nan)
+                squared = sum(np.nan_to_num((v - mean) ** 2) for v in window_values)
+                std = np.where(counts > 1, np.sqrt(squared / (counts - 1)), np.nan)
+            features[f'pup_rolling_mean_{window}'] = np.where(has_group, mean, np.nan)
+            features[f'pup_rolling_std_{window}'] = np.where(has_group, std, np.nan)
+            
+        return features
+        
     def train_classical_models(self, df: pd.DataFrame, target_col: str = 'current_pup') -> Dict[str, Any]:
-        """Train classical ML models (LightGBM + XGBoost ensemble)"""
+        """
+        Train classical ML models (LightGBM + XGBoost ensemble)
+        
+        The time-series CV folds of both models run concurrently on a process
+        pool; the final models are fit on the full data for the mean best
+        iteration found by early stopping in CV.
+        """
         
         # Select features for training
         feature_cols = [col for col in df.columns if col not in [
@@ -162,243 +966,457 @@ class SAPienceMLService:
         self.scalers['features'] = scaler
         
         # Time series split for validation
-        tscv = TimeSeriesSplit(n_splits=5)
-        
-        # Train LightGBM
-        lgb_params = {
-            'objective': 'regression',
-            'metric': 'mape',
-            'boosting_type': 'gbdt',
-            'num_leaves': 31,
-            'learning_rate': 0.05,
-            'feature_fraction': 0.9,
-            'bagging_fraction': 0.8,
-            'bagging_freq': 5,
-            'verbose': 0
-        }
+        tscv = TimeSeriesSplit(n_splits=self.CV_SPLITS)
+        folds = list(tscv.split(X))
         
-        lgb_scores = []
-        for train_idx, val_idx in tscv.split(X):
-            X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
-            y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
-            
-            train_data = lgb.Dataset(X_train, label=y_train)
-            val_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
-            
-            model = lgb.train(
-                lgb_params,
-                train_data,
-                valid_sets=[val_data],
-                num_boost_round=1000,
-                callbacks=[lgb.early_stopping(100), lgb.log_evaluation(0)]
-            )
-            
-            val_pred = model.predict(X_val)
-            mape = mean_absolute_percentage_error(y_val, val_pred)
-            lgb_scores.append(mape)
+        lgb_params = dict(self.LIGHTGBM_PARAMS)
+        xgb_params = dict(self.XGBOOST_PARAMS)
+        if self.lightgbm_threads:
+            lgb_params['num_threads'] = self.lightgbm_threads
+        if self.xgboost_threads:
+            xgb_params['n_jobs'] = self.xgboost_threads
+        
+        # Cross-validate both models, splitting the CPUs between fold workers
+        cpu_count = os.cpu_count() or 1
+        workers = self.cv_workers or min(cpu_count, 2 * len(folds))
+        fold_threads = max(1, cpu_count // workers)
+        fold_lgb_params = {'num_threads': fold_threads, **lgb_params}
+        fold_xgb_params = {'n_jobs': fold_threads, **xgb_params}
+        
+        jobs = [(_lightgbm_cv_fold, fold_lgb_params, train_idx, val_idx) for train_idx, val_idx in folds]
+        jobs += [(_xgboost_cv_fold, fold_xgb_params, train_idx, val_idx) for train_idx, val_idx in folds]
+        cv_data = (X.to_numpy(dtype=np.float64), X_scaled, y.to_numpy(dtype=np.float64))
+        
+        if workers > 1:
+            # spawn: forking after OpenMP has been initialised can deadlock the boosters
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_cv_worker,
+                initargs=cv_data
+            ) as pool:
+                futures = [
+                    pool.submit(fold_fn, params, train_idx, val_idx, self.MAX_BOOST_ROUNDS, self.EARLY_STOPPING_ROUNDS)
+                    for fold_fn, params, train_idx, val_idx in jobs
+                ]
+                fold_results = [future.result() for future in futures]
+        else:
+            _init_cv_worker(*cv_data)
+            try:
+                fold_results = [
+                    fold_fn(params, train_idx, val_idx, self.MAX_BOOST_ROUNDS, self.EARLY_STOPPING_ROUNDS)
+                    for fold_fn, params, train_idx, val_idx in jobs
+                ]
+            finally:
+                _cv_data.clear()
+        
+        lgb_scores, lgb_iterations = zip(*fold_results[:len(folds)])
+        xgb_scores, xgb_iterations = zip(*fold_results[len(folds):])
+        lgb_rounds = max(1, int(round(np.mean(lgb_iterations))))
+        xgb_rounds = max(1, int(round(np.mean(xgb_iterations))))
         
         # Train final LightGBM model on full dataset
         train_data = lgb.Dataset(X, label=y)
-        lgb_model = lgb.train(lgb_params, train_data, num_boost_round=1000)
+        lgb_model = lgb.train(lgb_params, train_data, num_boost_round=lgb_rounds)
         self.classical_models['lightgbm'] = lgb_model
         
-        # Train XGBoost
-        xgb_params = {
-            'objective': 'reg:squarederror',
-            'eval_metric': 'mape',
-            'max_depth': 6,
-            'learning_rate': 0.05,
-            'n_estimators': 1000,
-            'subsample': 0.8,
-            'colsample_bytree': 0.8,
-            'random_state': 42
-        }
-        
-        xgb_scores = []
-        for train_idx, val_idx in tscv.split(X_scaled):
-            X_train, X_val = X_scaled[train_idx], X_scaled[val_idx]
-            y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
-            
-            model = xgb.XGBRegressor(**xgb_params)
-            model.fit(
-                X_train, y_train,
-                eval_set=[(X_val, y_val)],
-                early_stopping_rounds=100,
-                verbose=False
-            )
-            
-            val_pred = model.predict(X_val)
-            mape = mean_absolute_percentage_error(y_val, val_pred)
-            xgb_scores.append(mape)
-        
         # Train final XGBoost model
-        xgb_model = xgb.XGBRegressor(**xgb_params)
+        xgb_model = xgb.XGBRegressor(**xgb_params, n_estimators=xgb_rounds)
         xgb_model.fit(X_scaled, y)
         self.classical_models['xgboost'] = xgb_model
         
         # Store feature columns
         self.classical_models['feature_cols'] = feature_cols
+        self.classical_models['best_iterations'] = {'lightgbm': lgb_rounds, 'xgboost': xgb_rounds}
+        self.classical_models['feature_importance'] = self._feature_importance(lgb_model, feature_cols)
         
         return {
             'lightgbm_mape': np.mean(lgb_scores),
             'xgboost_mape': np.mean(xgb_scores),
-            'feature_importance': dict(zip(feature_cols, lgb_model.feature_importance()))
+            'lightgbm_best_iteration': lgb_rounds,
+            'xgboost_best_iteration': xgb_rounds,
+            'feature_importance': self.classical_models['feature_importance']
         }
     
-    def create_quantum_circuit(self, n_qubits: int = 4) -> QuantumCircuit:
+    @staticmethod
+    def _feature_importance(lgb_model: Any, feature_cols: List[str]) -> Dict[str, int]:
+        """LightGBM split counts per feature, as plain ints so the manifest can be JSON-encoded"""
+        return {col: int(value) for col, value in zip(feature_cols, lgb_model.feature_importance())}
+    
+    def create_quantum_circuit(self, n_qubits: int = 4, reps: Optional[int] = None) -> 'QuantumCircuit':
         """
         Create quantum circuit for PUP optimization
         Based on your existing QAOA implementation
+        
+        The circuit is left parameterized and cached per (n_qubits, reps);
+        bind and sample it with run_quantum_circuits. A copy is returned so
+        callers cannot alter the cached circuit.
         """
+        return self.compile_quantum_circuit(n_qubits, reps).circuit.copy()
+    
+    def compile_quantum_circuit(self, n_qubits: int = 4, reps: Optional[int] = None) -> CompiledCircuit:
+        """Build and transpile the PUP circuit once per (n_qubits, reps)"""
         if not HAS_QUANTUM:
             raise ImportError("Quantum libraries not available")
+        _load_quantum_backend()
+        
+        reps = self.QUANTUM_REPS if reps is None else reps
+        key = (n_qubits, reps)
+        compiled = self.quantum_circuits.get(key)
+        if compiled is not None:
+            return compiled
+        
+        with self._circuit_lock:
+            if key in self.quantum_circuits:
+                return self.quantum_circuits[key]
+            
+            # Create quantum and classical registers
+            qreg = QuantumRegister(n_qubits, 'q')
+            creg = ClassicalRegister(n_qubits, 'c')
+            circuit = QuantumCircuit(qreg, creg)
+            
+            # Initialize in superposition
+            circuit.h(qreg)
+            
+            # Parameterized ansatz for optimization
+            ansatz = RealAmplitudes(n_qubits, reps=reps)
+            circuit.compose(ansatz, inplace=True)
+            
+            # Measure all qubits
+            circuit.measure(qreg, creg)
+            
+            simulator = AerSimulator()
+            start = time.perf_counter()
+            transpiled = transpile(circuit, simulator)
+            elapsed = time.perf_counter() - start
+            
+            compiled = CompiledCircuit(circuit, transpiled, list(circuit.parameters), simulator, elapsed)
+            self.quantum_circuits[key] = compiled
+            self.quantum_telemetry['circuits_compiled'] += 1
+            self.quantum_telemetry['transpile_seconds'] += elapsed
+            
+        return compiled
+    
+    def run_quantum_circuits(
+        self,
+        parameter_values: np.ndarray,
+        n_qubits: int = 4,
+        reps: Optional[int] = None,
+        shots: Optional[int] = None,
+        seed: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Sample the cached circuit once per row of `parameter_values` (n_bindings, n_parameters).
+        Bindings go to the simulator QUANTUM_MAX_BINDINGS per job; returns the
+        (n_bindings, 2**n_qubits) matrix of measured frequencies, column = basis state.
         
-        # Create quantum and classical registers
-        qreg = QuantumRegister(n_qubits, 'q')
-        creg = ClassicalRegister(n_qubits, 'c')
-        circuit = QuantumCircuit(qreg, creg)
+        Not used by predict_pup_batch, which scores the quantum step with the
+        closed-form quantum_optimize_pup_batch; this is for offline analysis
+        and scripts/benchmark-ml-service.py.
+        """
+        compiled = self.compile_quantum_circuit(n_qubits, reps)
+        values = np.asarray(parameter_values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(compiled.parameters):
+            raise Exception(f"Expected (n, {len(compiled.parameters)}) parameter values, got {values.shape}")
         
-        # Initialize in superposition
-        circuit.h(qreg)
+        shots = shots or self.quantum_shots
+        n_bindings = len(values)
+        counts = np.zeros((n_bindings, 2 ** n_qubits))
         
-        # Parameterized ansatz for optimization
-        ansatz = RealAmplitudes(n_qubits, reps=2)
-        circuit.compose(ansatz, inplace=True)
+        for start in range(0, n_bindings, self.QUANTUM_MAX_BINDINGS):
+            chunk = values[start:start + self.QUANTUM_MAX_BINDINGS]
+            binds = [{param: chunk[:, j].tolist() for j, param in enumerate(compiled.parameters)}]
+            options = {} if seed is None else {'seed_simulator': seed + start}
+            
+            job_start = time.perf_counter()
+            result = compiled.simulator.run(compiled.transpiled, parameter_binds=binds, shots=shots, **options).result()
+            elapsed = time.perf_counter() - job_start
+            
+            for i in range(len(chunk)):
+                for bits, count in result.get_counts(i).items():
+                    counts[start + i, int(bits, 2)] = count
+            
+            with self._circuit_lock:
+                self.quantum_telemetry['jobs'] += 1
+                self.quantum_telemetry['bindings'] += len(chunk)
+                self.quantum_telemetry['shots'] += len(chunk) * shots
+                self.quantum_telemetry['simulate_seconds'] += elapsed
         
-        # Measure all qubits
-        circuit.measure(qreg, creg)
+        return counts / shots
+    
+    def quantum_parameters_batch(
+        self,
+        price_ratios: np.ndarray,
+        quantities: np.ndarray,
+        n_qubits: int = 4,
+        reps: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Ansatz angles per row from the same QAOA parameters as quantum_optimize_pup_batch.
+        Rotation layers alternate between beta (mixing) and gamma (cost).
+        """
+        reps = self.QUANTUM_REPS if reps is None else reps
+        beta, gamma = self._qaoa_angles(price_ratios, quantities)
+        layers = [beta if layer % 2 == 0 else gamma for layer in range(reps + 1)]
+        return np.repeat(np.column_stack(layers), n_qubits, axis=1)
+    
+    def simulate_pup_states(
+        self,
+        price_ratios: np.ndarray,
+        quantities: np.ndarray,
+        n_qubits: int = 4,
+        reps: Optional[int] = None,
+        shots: Optional[int] = None,
+        seed: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Measured state distribution for a whole batch of rows (e.g. the
+        price_ratio / quantity columns of prepare_features), one simulator job per
+        QUANTUM_MAX_BINDINGS rows.
+        """
+        parameters = self.quantum_parameters_batch(price_ratios, quantities, n_qubits, reps)
+        return self.run_quantum_circuits(parameters, n_qubits, reps, shots, seed)
+    
+    @staticmethod
+    def _qaoa_angles(price_ratios: np.ndarray, quantities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """QAOA mixing (beta) and cost (gamma) parameters based on SAP data"""
+        price_ratios = np.asarray(price_ratios, dtype=np.float64)
+        quantity_weight = np.log(np.asarray(quantities, dtype=np.float64) + 1) / 10
         
-        return circuit
+        beta = np.pi * price_ratios * 0.3  # Mixing parameter
+        gamma = np.pi * quantity_weight * 0.4  # Cost parameter
+        return beta, gamma
     
     def quantum_optimize_pup(
         self, 
         classical_prediction: float,
         sap_features: Dict[str, float]
-    ) -> Tuple[float, List[str], float]:
+    ) -> Tuple[float, Sequence, float]:
         """
         Quantum optimization based on your existing implementation
         """
         if not HAS_QUANTUM:
             return classical_prediction, [], 1.0
         
-        # Extract key parameters from SAP features
-        price_ratio = sap_features.get('price_ratio', 1.0)
-        quantity_weight = np.log(sap_features.get('quantity', 1) + 1) / 10
+        optimized_pup, confidence, state_probs = self.quantum_optimize_pup_batch(
+            np.array([classical_prediction]),
+            np.array([sap_features.get('price_ratio', 1.0)]),
+            np.array([sap_features.get('quantity', 1)])
+        )
         
-        # QAOA parameters based on SAP data
-        beta = np.pi * price_ratio * 0.3  # Mixing parameter
-        gamma = np.pi * quantity_weight * 0.4  # Cost parameter
+        return optimized_pup[0], QuantumStates(state_probs[0]), confidence[0]
+    
+    def quantum_optimize_pup_batch(
+        self,
+        classical_predictions: np.ndarray,
+        price_ratios: np.ndarray,
+        quantities: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Array version of quantum_optimize_pup.
+        Returns optimized PUP, confidence and the (n, 4) state-probability matrix in percent.
+        """
+        classical_predictions = np.asarray(classical_predictions, dtype=np.float64)
+        n_rows = len(classical_predictions)
         
-        # Quantum states and probabilities
-        quantum_states = [
-            f"|00⟩: {(np.cos(beta/2)**2 * 100):.2f}%",
-            f"|01⟩: {(np.sin(beta/2)**2 * np.cos(gamma)**2 * 100):.2f}%",
-            f"|10⟩: {(np.sin(beta/2)**2 * np.sin(gamma)**2 * 100):.2f}%",
-            f"|11⟩: {(np.cos(beta/2)**2 * np.sin(gamma/2)**2 * 100):.2f}%"
-        ]
+        if not HAS_QUANTUM:
+            return classical_predictions, np.ones(n_rows), np.empty((n_rows, 0))
+        
+        # QAOA parameters from SAP features
+        beta, gamma = self._qaoa_angles(price_ratios, quantities)
+        
+        # State probabilities |00⟩, |01⟩, |10⟩, |11⟩
+        cos_half_beta_sq = np.cos(beta/2)**2
+        sin_half_beta_sq = np.sin(beta/2)**2
+        state_probs = np.column_stack([
+            cos_half_beta_sq,
+            sin_half_beta_sq * np.cos(gamma)**2,
+            sin_half_beta_sq * np.sin(gamma)**2,
+            cos_half_beta_sq * np.sin(gamma/2)**2
+        ]) * 100
         
         # Quantum advantage calculation
         entanglement_boost = np.sin(beta) * np.cos(gamma)
         quantum_advantage = 1 + (entanglement_boost * 0.15)  # Up to 15% improvement
         
         # Apply quantum optimization
-        optimized_pup = classical_prediction * quantum_advantage
+        optimized_pup = classical_predictions * quantum_advantage
         
         # Confidence based on quantum coherence
-        coherence_score = abs(np.cos(beta) * np.sin(gamma))
-        confidence = min(0.98, 0.75 + coherence_score * 0.23)
+        coherence_score = np.abs(np.cos(beta) * np.sin(gamma))
+        confidence = np.minimum(0.98, 0.75 + coherence_score * 0.23)
         
-        return optimized_pup, quantum_states, confidence
+        return optimized_pup, confidence, state_probs
+    
+    def predict_classical(self, df: pd.DataFrame, batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Ensemble (LightGBM + XGBoost) predictions for every row of a prepared frame.
+        The feature matrix is built and scaled once; each model runs once per chunk.
+        """
+        feature_cols = self.classical_models['feature_cols']
+        X = df[feature_cols].fillna(0)
+        
+        n_rows = len(X)
+        chunk = batch_size or max(n_rows, 1)
+        predictions = np.empty(n_rows, dtype=np.float64)
+        
+        for start in range(0, n_rows, chunk):
+            X_chunk = X.iloc[start:start + chunk]
+            X_chunk_scaled = self.scalers['features'].transform(X_chunk)
+            
+            lgb_pred = self.classical_models['lightgbm'].predict(X_chunk)
+            xgb_pred = self.classical_models['xgboost'].predict(X_chunk_scaled)
+            predictions[start:start + len(X_chunk)] = (lgb_pred + xgb_pred) / 2
+        
+        return predictions
     
     def predict_pup(
         self, 
         sap_data: List[Dict[str, Any]],
-        horizon: ForecastHorizon = ForecastHorizon.MONTHLY
+        horizon: ForecastHorizon = ForecastHorizon.MONTHLY,
+        batch_size: Optional[int] = None,
+        feature_store: Optional[GroupFeatureStore] = None
     ) -> List[PUPPrediction]:
         """
         Main prediction method combining classical and quantum approaches
+        
+        `batch_size` bounds how many rows are scored per model call (default: all at once).
+        """
+        return self.predict_pup_batch(sap_data, horizon, batch_size, feature_store).to_predictions()
+    
+    def predict_pup_batch(
+        self,
+        sap_data: Union[List[Dict[str, Any]], Dict[str, np.ndarray], pd.DataFrame],
+        horizon: ForecastHorizon = ForecastHorizon.MONTHLY,
+        batch_size: Optional[int] = None,
+        feature_store: Optional[GroupFeatureStore] = None
+    ) -> PredictionBatch:
+        """
+        Columnar variant of predict_pup: every field is computed as one array
         """
         if not self.is_trained:
             raise ValueError("Models not trained. Call train() first.")
         
-        # Prepare features
-        df = self.prepare_features(sap_data)
-        
-        predictions = []
-        
-        for _, row in df.iterrows():
-            # Classical prediction
-            classical_pred = None
-            if self.model_type in [MLModelType.CLASSICAL_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
-                # Get features for prediction
-                feature_cols = self.classical_models['feature_cols']
-                features = row[feature_cols].fillna(0).values.reshape(1, -1)
-                features_scaled = self.scalers['features'].transform(features)
-                
-                # Ensemble prediction (LightGBM + XGBoost)
-                lgb_pred = self.classical_models['lightgbm'].predict(features)[0]
-                xgb_pred = self.classical_models['xgboost'].predict(features_scaled)[0]
-                classical_pred = (lgb_pred + xgb_pred) / 2
-            
-            # Quantum optimization
-            quantum_pred = None
-            quantum_states = None
-            confidence = 0.8
-            
-            if self.model_type in [MLModelType.QUANTUM_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
-                base_pred = classical_pred if classical_pred is not None else row['current_pup']
-                
-                sap_features = {
-                    'price_ratio': row.get('price_ratio', 1.0),
-                    'quantity': row.get('quantity', 0),
-                    'volume_value': row.get('volume_value', 0)
-                }
-                
-                quantum_pred, quantum_states, confidence = self.quantum_optimize_pup(
-                    base_pred, sap_features
-                )
-            
-            # Final prediction based on model type
-            if self.model_type == MLModelType.CLASSICAL_ONLY:
-                final_pred = classical_pred
-                model_type = "classical"
-            elif self.model_type == MLModelType.QUANTUM_ONLY:
-                final_pred = quantum_pred
-                model_type = "quantum"
-            else:  # HYBRID or AUTO
-                final_pred = quantum_pred if quantum_pred is not None else classical_pred
-                model_type = "hybrid"
-            
-            # Calculate confidence interval
-            base_uncertainty = final_pred * 0.1  # 10% base uncertainty
-            confidence_width = base_uncertainty / confidence
-            ci_lower = final_pred - confidence_width
-            ci_upper = final_pred + confidence_width
-            
-            # Create prediction object
-            prediction = PUPPrediction(
-                material_number=row['material'],
-                company_code=row['company_code'],
-                plant=row['plant'],
-                period=row['period'],
-                predicted_pup=final_pred,
-                confidence_interval=(ci_lower, ci_upper),
-                classical_prediction=classical_pred,
-                quantum_optimization=quantum_pred,
-                model_type=model_type,
-                quantum_states=quantum_states,
-                features_importance=self.classical_models.get('feature_importance') if classical_pred else None
+        # Prepare features; a positional index maps results back to input rows
+        df = self.prepare_features(pd.DataFrame(sap_data).reset_index(drop=True), feature_store)
+        
+        if self.prediction_cache is not None:
+            results = self._score_rows_cached(df, batch_size)
+        else:
+            results = self._score_rows(df, batch_size)
+        
+        return PredictionBatch(
+            material_number=df['material'].to_numpy(),
+            company_code=df['company_code'].to_numpy(),
+            plant=df['plant'].to_numpy(),
+            period=df['period'].to_numpy(),
+            model_type=self._model_type_label(),
+            features_importance=self.classical_models.get('feature_importance'),
+            source_index=df.index.to_numpy(),
+            **results
+        )
+    
+    def _model_type_label(self) -> str:
+        if self.model_type == MLModelType.CLASSICAL_ONLY:
+            return "classical"
+        if self.model_type == MLModelType.QUANTUM_ONLY:
+            return "quantum"
+        return "hybrid"
+    
+    def _score_rows(self, df: pd.DataFrame, batch_size: Optional[int] = None) -> Dict[str, Optional[np.ndarray]]:
+        """Prediction arrays (PredictionBatch fields) for every row of a prepared frame"""
+        
+        # Classical predictions for the whole batch
+        classical_preds = None
+        if self.model_type in [MLModelType.CLASSICAL_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
+            classical_preds = self.predict_classical(df, batch_size)
+        
+        # Quantum optimization for the whole batch
+        quantum_preds = None
+        quantum_probs = None
+        confidences = np.full(len(df), 0.8)
+        if self.model_type in [MLModelType.QUANTUM_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
+            base_preds = classical_preds if classical_preds is not None else df['current_pup'].to_numpy()
+            quantum_preds, confidences, quantum_probs = self.quantum_optimize_pup_batch(
+                base_preds, df['price_ratio'].to_numpy(), df['quantity'].to_numpy()
             )
-            
-            predictions.append(prediction)
         
-        return predictions
+        # Final prediction based on model type
+        if self.model_type == MLModelType.CLASSICAL_ONLY:
+            final_preds = classical_preds
+        elif self.model_type == MLModelType.QUANTUM_ONLY:
+            final_preds = quantum_preds
+        else:  # HYBRID or AUTO
+            final_preds = quantum_preds if quantum_preds is not None else classical_preds
+        
+        # Calculate confidence interval
+        base_uncertainty = final_preds * 0.1  # 10% base uncertainty
+        confidence_width = base_uncertainty / confidences
+        
+        return {
+            'predicted_pup': final_preds,
+            'ci_lower': final_preds - confidence_width,
+            'ci_upper': final_preds + confidence_width,
+            'classical_prediction': classical_preds,
+            'quantum_optimization': quantum_preds,
+            'quantum_probabilities': quantum_probs
+        }
+    
+    def _score_rows_cached(self, df: pd.DataFrame, batch_size: Optional[int] = None) -> Dict[str, Optional[np.ndarray]]:
+        """
+        _score_rows through the prediction cache: only rows whose feature
+        fingerprint is not cached for this model version are scored
+        """
+        has_classical = self.model_type in [MLModelType.CLASSICAL_ONLY, MLModelType.HYBRID, MLModelType.AUTO]
+        has_quantum = self.model_type in [MLModelType.QUANTUM_ONLY, MLModelType.HYBRID, MLModelType.AUTO]
+        n_states = len(QuantumStates.LABELS) if has_quantum and HAS_QUANTUM else 0
+        
+        # Everything the result depends on: model features plus the quantum inputs
+        columns = list(self.classical_models['feature_cols']) if has_classical else []
+        columns += [col for col in ('current_pup', 'price_ratio', 'quantity') if col not in columns]
+        
+        cache = self.prediction_cache
+        fingerprints = cache.fingerprint(df, columns)
+        found, cached = cache.get_many(self.model_version, fingerprints)
+        
+        # Packed layout: predicted, CI lower/upper, classical, quantum, state probabilities
+        packed = np.empty((len(df), 5 + n_states), dtype=np.float64)
+        if found.any():
+            packed[found] = np.vstack([value for value in cached if value is not None])
+        
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            fresh = self._score_rows(df.iloc[missing], batch_size)
+            packed[missing, 0] = fresh['predicted_pup']
+            packed[missing, 1] = fresh['ci_lower']
+            packed[missing, 2] = fresh['ci_upper']
+            packed[missing, 3] = fresh['classical_prediction'] if has_classical else np.nan
+            packed[missing, 4] = fresh['quantum_optimization'] if has_quantum else np.nan
+            if n_states:
+                packed[missing, 5:] = fresh['quantum_probabilities']
+            cache.put_many(self.model_version, fingerprints[missing], packed[missing])
+        
+        return {
+            'predicted_pup': packed[:, 0],
+            'ci_lower': packed[:, 1],
+            'ci_upper': packed[:, 2],
+            'classical_prediction': packed[:, 3] if has_classical else None,
+            'quantum_optimization': packed[:, 4] if has_quantum else None,
+            'quantum_probabilities': packed[:, 5:] if has_quantum else None
+        }
     
     def train(self, sap_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Train the hybrid ML service"""
         
+        # Full retrain: refit vocabularies, scaler and models, even after a warm start
+        self.is_trained = False
+        self.feature_encoders = {}
+        self.scalers = {}
+        self.classical_models = {}
+        
         # Prepare features
-        df = self.prepare_features(sap_data)
+        raw = pd.DataFrame(sap_data)
+        df = self.prepare_features(raw)
         
         results = {}
         
@@ -412,17 +1430,286 @@ class SAPienceMLService:
             results['quantum_circuits_ready'] = True
         
         self.is_trained = True
+        self.model_version = self._new_model_version()
+        self.history_tail = self._group_tails(df, list(raw.columns))
+        if self.prediction_cache is not None:
+            self.prediction_cache.clear()
+        self._history_path = None
+        
+        return results
+    
+    def update(self, new_sap_data: List[Dict[str, Any]], boost_rounds: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Continue training from newly arrived periods
+        
+        Extends the category vocabularies, rebuilds lag/rolling features from
+        the new rows plus the stored tails of their groups only, and keeps boosting the
+        existing LightGBM/XGBoost models on the new rows. The feature scaler
+        is left as fitted so the existing trees keep their meaning.
+        """
+        if not self.is_trained:
+            raise ValueError("Models not trained. Call train() first.")
+        
+        new_df = pd.DataFrame(new_sap_data)
+        history = self._load_history_tail()
+        if history is None:
+            raise ValueError("No training history available; call train() on the full history first")
+        
+        # New categories get new codes, existing codes stay put
+        for col, encoder in self.feature_encoders.items():
+            if col in new_df.columns:
+                encoder.extend(new_df[col])
+        
+        # Only the groups with new rows need their features rebuilt
+        touched = self._group_index(history).isin(self._group_index(new_df))
+        
+        # Re-sent periods replace the stored ones
+        combined = pd.concat(
+            [history[touched].assign(_is_new=False), new_df.assign(_is_new=True)],
+            ignore_index=True
+        ).drop_duplicates(self.GROUP_COLS + ['period'], keep='last')
+        
+        df = self.prepare_features(combined)
+        is_new = df['_is_new'].to_numpy(dtype=bool)
+        
+        results = {'new_rows': int(is_new.sum())}
+        
+        if self.model_type in [MLModelType.CLASSICAL_ONLY, MLModelType.HYBRID, MLModelType.AUTO]:
+            results.update(self.update_classical_models(df[is_new], boost_rounds=boost_rounds))
+        
+        self.history_tail = pd.concat(
+            [history[~touched], self._group_tails(df, list(history.columns))],
+            ignore_index=True
+        )
+        self._history_path = None
+        self.model_version = self._new_model_version()
+        if self.prediction_cache is not None:
+            self.prediction_cache.clear()
         
         return results
     
+    def update_classical_models(
+        self,
+        df: pd.DataFrame,
+        target_col: str = 'current_pup',
+        boost_rounds: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Add boosting rounds to the trained LightGBM/XGBoost models using only `df`"""
+        feature_cols = self.classical_models['feature_cols']
+        
+        X = df[feature_cols].fillna(0)
+        y = df[target_col]
+        X_scaled = self.scalers['features'].transform(X)
+        
+        rounds = boost_rounds or self.UPDATE_BOOST_ROUNDS
+        
+        lgb_params = dict(self.LIGHTGBM_PARAMS)
+        xgb_params = dict(self.XGBOOST_PARAMS)
+        if self.lightgbm_threads:
+            lgb_params['num_threads'] = self.lightgbm_threads
+        if self.xgboost_threads:
+            xgb_params['n_jobs'] = self.xgboost_threads
+        
+        lgb_model = lgb.train(
+            lgb_params,
+            lgb.Dataset(X, label=y),
+            num_boost_round=rounds,
+            init_model=self.classical_models['lightgbm']
+        )
+        self.classical_models['lightgbm'] = lgb_model
+        self.classical_models['feature_importance'] = self._feature_importance(lgb_model, feature_cols)
+        
+        xgb_model = xgb.XGBRegressor(**xgb_params, n_estimators=rounds)
+        xgb_model.fit(X_scaled, y, xgb_model=self.classical_models['xgboost'].get_booster())
+        self.classical_models['xgboost'] = xgb_model
+        
+        return {
+            'boost_rounds': rounds,
+            'lightgbm_trees': lgb_model.num_trees(),
+            'xgboost_trees': xgb_model.get_booster().num_boosted_rounds(),
+            'lightgbm_mape': mean_absolute_percentage_error(y, lgb_model.predict(X)),
+            'xgboost_mape': mean_absolute_percentage_error(y, xgb_model.predict(X_scaled))
+        }
+    
+    def build_feature_store(self) -> GroupFeatureStore:
+        """Streaming feature state seeded from the training history tails"""
+        store = GroupFeatureStore(self.LAGS, self.ROLLING_WINDOWS)
+        history = self._load_history_tail()
+        if history is not None:
+            store.update_frame(history)
+        return store
+    
+    def _group_tails(self, df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Last HISTORY_LENGTH rows of each group from a prepared (group/period sorted) frame"""
+        tails = df.groupby(self.GROUP_COLS, sort=False).tail(self.HISTORY_LENGTH)
+        return tails[columns].reset_index(drop=True)
+    
+    def _group_index(self, df: pd.DataFrame) -> pd.MultiIndex:
+        """Group keys as strings, matching history read back from JSON to fresh records"""
+        return pd.MultiIndex.from_arrays([df[col].astype(str) for col in self.GROUP_COLS])
+    
+    def _load_history_tail(self) -> Optional[pd.DataFrame]:
+        """Group tails, read from the loaded artifact on first use"""
+        if self.history_tail is None and self._history_path and os.path.exists(self._history_path):
+            with open(self._history_path) as f:
+                self.history_tail = pd.read_json(
+                    io.StringIO(f.read()), orient='split', dtype=False, convert_dates=False
+                )
+        return self.history_tail
+    
+    @staticmethod
+    def _new_model_version() -> str:
+        """Sortable UTC timestamp identifying one set of trained models"""
+        return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    
+    def save(self, directory: str) -> str:
+        """
+        Save the trained models as a versioned artifact
+        
+        Writes `directory/<model_version>/` (native LightGBM text and XGBoost
+        UBJSON models, a JSON manifest with the scaler, vocabularies and
+        feature columns, and the group history tails used by update()),
+        then points `directory/LATEST` at it.
+        Returns the artifact path.
+        """
+        if not self.is_trained:
+            raise ValueError("Models not trained. Call train() first.")
+        
+        artifact_dir = os.path.join(directory, self.model_version)
+        os.makedirs(artifact_dir, exist_ok=True)
+        
+        manifest = {
+            'format_version': self.ARTIFACT_FORMAT_VERSION,
+            'model_version': self.model_version,
+            'model_type': self.model_type.value,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'feature_encoders': {
+                col: encoder.classes_.tolist() for col, encoder in self.feature_encoders.items()
+            }
+        }
+        
+        if 'feature_cols' in self.classical_models:
+            self.classical_models['lightgbm'].save_model(os.path.join(artifact_dir, self.LIGHTGBM_FILE))
+            self.classical_models['xgboost'].save_model(os.path.join(artifact_dir, self.XGBOOST_FILE))
+            
+            scaler = self.scalers['features']
+            manifest['classical'] = {
+                'feature_cols': list(self.classical_models['feature_cols']),
+                'feature_importance': self.classical_models.get('feature_importance'),
+                'best_iterations': self.classical_models.get('best_iterations'),
+                'lightgbm': self.LIGHTGBM_FILE,
+                'xgboost': self.XGBOOST_FILE,
+                'lightgbm_version': lgb.__version__,
+                'xgboost_version': xgb.__version__,
+                'scaler': {
+                    'mean': scaler.mean_.tolist(),
+                    'scale': scaler.scale_.tolist(),
+                    'var': scaler.var_.tolist(),
+                    'n_samples_seen': np.asarray(scaler.n_samples_seen_).tolist()
+                }
+            }
+        
+        history = self._load_history_tail()
+        if history is not None:
+            self._write_atomic(os.path.join(artifact_dir, self.HISTORY_FILE), history.to_json(orient='split', index=False))
+            manifest['history'] = self.HISTORY_FILE
+        
+        self._write_atomic(os.path.join(artifact_dir, self.ARTIFACT_MANIFEST), json.dumps(manifest, indent=2))
+        self._write_atomic(os.path.join(directory, self.ARTIFACT_LATEST), self.model_version)
+        
+        logging.info(f"Saved model artifact {self.model_version} to {artifact_dir}")
+        return artifact_dir
+    
+    @classmethod
+    def load(
+        cls,
+        directory: str,
+        version: Optional[str] = None,
+        lazy: bool = True
+    ) -> 'SAPienceMLService':
+        """
+        Load a service saved with save()
+        
+        Reads the manifest only; the LightGBM/XGBoost models are parsed on
+        first prediction unless lazy=False. Defaults to the LATEST version.
+        """
+        if version is None:
+            with open(os.path.join(directory, cls.ARTIFACT_LATEST)) as f:
+                version = f.read().strip()
+        
+        artifact_dir = os.path.join(directory, version)
+        with open(os.path.join(artifact_dir, cls.ARTIFACT_MANIFEST)) as f:
+            manifest = json.load(f)
+        
+        if manifest.get('format_version') != cls.ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact format: {manifest.get('format_version')}")
+        
+        service = cls(MLModelType(manifest['model_type']))
+        service.model_version = manifest['model_version']
+        service.feature_encoders = {
+            col: CategoryVocabulary(classes) for col, classes in manifest['feature_encoders'].items()
+        }
+        
+        classical = manifest.get('classical')
+        if classical:
+            feature_cols = classical['feature_cols']
+            
+            scaler = StandardScaler()
+            scaler.mean_ = np.asarray(classical['scaler']['mean'])
+            scaler.scale_ = np.asarray(classical['scaler']['scale'])
+            scaler.var_ = np.asarray(classical['scaler']['var'])
+            scaler.n_samples_seen_ = np.asarray(classical['scaler']['n_samples_seen'])
+            scaler.n_features_in_ = len(feature_cols)
+            scaler.feature_names_in_ = np.asarray(feature_cols, dtype=object)
+            service.scalers['features'] = scaler
+            
+            def load_lightgbm():
+                return lgb.Booster(model_file=os.path.join(artifact_dir, classical['lightgbm']))
+            
+            def load_xgboost():
+                model = xgb.XGBRegressor()
+                model.load_model(os.path.join(artifact_dir, classical['xgboost']))
+                return model
+            
+            values = {'feature_cols': feature_cols}
+            for key in ('feature_importance', 'best_iterations'):
+                if classical.get(key) is not None:
+                    values[key] = classical[key]
+            
+            service.classical_models = LazyModelStore(
+                values,
+                loaders={'lightgbm': load_lightgbm, 'xgboost': load_xgboost}
+            )
+            if not lazy:
+                service.classical_models.preload()
+        
+        if manifest.get('history'):
+            service._history_path = os.path.join(artifact_dir, manifest['history'])
+        
+        service.is_trained = True
+        
+        logging.info(f"Loaded model artifact {service.model_version} from {artifact_dir}")
+        return service
+    
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        """Write via a temp file + rename so readers never see a partial file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about trained models"""
         info = {
             'model_type': self.model_type.value,
             'is_trained': self.is_trained,
+            'model_version': self.model_version,
             'has_classical': bool(self.classical_models),
             'has_quantum': HAS_QUANTUM,
             'feature_encoders': list(self.feature_encoders.keys()),
+            'quantum_circuits': [f"{n_qubits}q/{reps}r" for n_qubits, reps in self.quantum_circuits],
+            'quantum_telemetry': dict(self.quantum_telemetry),
         }
         
         if self.classical_models:
@@ -431,17 +1718,253 @@ class SAPienceMLService:
         
         return info
 
+# Inference worker processes; module level so the pool can run them.
+# Each worker keeps one loaded service and reloads when the version moves on.
+_inference_state: Dict[str, Any] = {}
+
+# Output block layout: source row, predicted, CI lower/upper, classical, quantum, 4 state probabilities
+INFERENCE_OUTPUT_COLUMNS = 10
+
+def _init_inference_worker(artifact_dir: str, cache_entries: int = 0, cache_ttl: float = 3600):
+    """Preload the latest models so requests never pay for parsing them"""
+    _inference_state['cache'] = PredictionCache(cache_entries, cache_ttl) if cache_entries else None
+    if os.path.exists(os.path.join(artifact_dir, SAPienceMLService.ARTIFACT_LATEST)):
+        service = SAPienceMLService.load(artifact_dir, lazy=False)
+        service.prediction_cache = _inference_state['cache']
+        _inference_state['service'] = service
+        try:
+            # Inference scores the quantum step in NumPy, so Qiskit is never needed here
+            if service.model_type != MLModelType.QUANTUM_ONLY:
+                preload_backends(MLModelType.CLASSICAL_ONLY)
+        except ImportError as e:
+            logging.warning(f"Backend preload failed, importing on first use: {e}")
+
+def _inference_service(artifact_dir: str, model_version: str) -> SAPienceMLService:
+    service = _inference_state.get('service')
+    if service is None or service.model_version != model_version:
+        service = SAPienceMLService.load(artifact_dir, version=model_version, lazy=False)
+        # Entries are keyed by version; drop the old model's to free the space
+        service.prediction_cache = _inference_state.get('cache')
+        if service.prediction_cache is not None:
+            service.prediction_cache.clear()
+        _inference_state['service'] = service
+    return service
+
+def _predict_shared(
+    artifact_dir: str,
+    model_version: str,
+    horizon: str,
+    columns: List[str],
+    numeric_cols: List[str],
+    object_cols: Dict[str, List[Any]],
+    n_rows: int,
+    input_name: str,
+    output_name: str
+) -> Dict[str, Any]:
+    """
+    Score one request inside an inference worker
+    
+    The numeric feature inputs (NUMERIC_COLS) are read from, and result
+    arrays written to, shared memory blocks owned by the caller; the key and
+    other columns and per-batch metadata are pickled.
+    """
+    service = _inference_service(artifact_dir, model_version)
+    
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        numeric = np.ndarray((n_rows, len(numeric_cols)), dtype=np.float64, buffer=input_shm.buf)
+        frame = pd.DataFrame(numeric.copy(), columns=numeric_cols)
+        del numeric
+        for col, values in object_cols.items():
+            frame[col] = values
+        
+        batch = service.predict_pup_batch(frame[columns], ForecastHorizon(horizon))
+        
+        output = np.ndarray((n_rows, INFERENCE_OUTPUT_COLUMNS), dtype=np.float64, buffer=output_shm.buf)
+        output[:, 0] = batch.source_index
+        output[:, 1] = batch.predicted_pup
+        output[:, 2] = batch.ci_lower
+        output[:, 3] = batch.ci_upper
+        output[:, 4] = batch.classical_prediction if batch.classical_prediction is not None else np.nan
+        output[:, 5] = batch.quantum_optimization if batch.quantum_optimization is not None else np.nan
+        n_states = batch.quantum_probabilities.shape[1] if batch.quantum_probabilities is not None else None
+        if n_states:
+            output[:, 6:6 + n_states] = batch.quantum_probabilities
+        del output
+    finally:
+        input_shm.close()
+        output_shm.close()
+    
+    return {
+        'model_type': batch.model_type,
+        'has_classical': batch.classical_prediction is not None,
+        'has_quantum': batch.quantum_optimization is not None,
+        'n_states': n_states,
+        'features_importance': batch.features_importance
+    }
+
+class PredictionCoalescer:
+    """
+    Micro-batching for concurrent prediction requests
+    
+    Requests arriving within `max_wait_ms` of the first pending one (or until
+    `max_rows` rows are pending) are merged into one frame and scored with a
+    single call to `run_batch`. Each request gets its own partition value,
+    so lag/rolling features never mix rows of different requests, and every
+    caller receives exactly the slice it would have got on its own.
+    """
+    
+    def __init__(
+        self,
+        run_batch: Callable[[pd.DataFrame, ForecastHorizon], Any],
+        max_wait_ms: float = 5.0,
+        max_rows: int = 5000
+    ):
+        self.run_batch = run_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_rows = max_rows
+        self._pending: Dict[ForecastHorizon, List[Tuple[pd.DataFrame, asyncio.Future]]] = {}
+        self._pending_rows: Dict[ForecastHorizon, int] = {}
+        self._timers: Dict[ForecastHorizon, asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self.batches = 0
+        self.requests = 0
+        
+    async def submit(
+        self,
+        sap_data: Union[List[Dict[str, Any]], pd.DataFrame],
+        horizon: ForecastHorizon
+    ) -> PredictionBatch:
+        frame = pd.DataFrame(sap_data).reset_index(drop=True)
+        
+        # Reject malformed requests here so they cannot fail a whole batch
+        missing_cols = [col for col in SAPienceMLService.REQUIRED_COLS if col not in frame.columns]
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {missing_cols}")
+        # Per-request dtypes, so one caller's strings cannot turn a merged column into objects
+        for col in SAPienceMLService.NUMERIC_COLS:
+            try:
+                frame[col] = pd.to_numeric(frame[col]).astype(np.float64)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Column {col} must be numeric: {e}")
+        
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        
+        pending = self._pending.setdefault(horizon, [])
+        pending.append((frame, future))
+        self._pending_rows[horizon] = self._pending_rows.get(horizon, 0) + len(frame)
+        self.requests += 1
+        
+        if self._pending_rows[horizon] >= self.max_rows:
+            self._flush(horizon)
+        elif horizon not in self._timers:
+            self._timers[horizon] = loop.call_later(self.max_wait, self._flush, horizon)
+        
+        return await future
+    
+    def _flush(self, horizon: ForecastHorizon):
+        timer = self._timers.pop(horizon, None)
+        if timer is not None:
+            timer.cancel()
+        
+        requests = self._pending.pop(horizon, [])
+        self._pending_rows.pop(horizon, None)
+        if requests:
+            self.batches += 1
+            task = asyncio.ensure_future(self._run(requests, horizon))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, requests: List[Tuple[pd.DataFrame, asyncio.Future]], horizon: ForecastHorizon):
+        partition_col = SAPienceMLService.PARTITION_COL
+        merged = pd.concat(
+            [frame.assign(**{partition_col: i}) for i, (frame, _) in enumerate(requests)],
+            ignore_index=True
+        )
+        
+        try:
+            batch = await self.run_batch(merged, horizon)
+        except Exception as e:
+            for _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        # Results are ordered by partition first, so each request is one contiguous run
+        offsets = np.cumsum([0] + [len(frame) for frame, _ in requests])
+        bounds = np.searchsorted(offsets[1:], batch.source_index, side='right')
+        starts = np.searchsorted(bounds, np.arange(len(requests)), side='left')
+        stops = np.searchsorted(bounds, np.arange(len(requests)), side='right')
+        
+        for i, (_, future) in enumerate(requests):
+            if future.done():
+                continue
+            result = batch.take(slice(starts[i], stops[i]))
+            result.source_index = result.source_index - offsets[i]
+            future.set_result(result)
+
 # FastAPI service wrapper
 class MLServiceAPI:
-    """FastAPI wrapper for the ML service"""
+    """
+    FastAPI wrapper for the ML service
     
-    def __init__(self):
-        self.ml_service = SAPienceMLService(MLModelType.HYBRID)
+    Inference runs on a process pool whose workers preload the models from
+    the artifact directory; training runs on its own single-slot executor,
+    then publishes a new artifact version the workers switch to. Boosting
+    releases the GIL and CV folds run in their own processes, so training
+    neither starves inference nor blocks the event loop for long. Each
+    worker keeps its own PredictionCache of recently scored rows.
+    """
+    
+    def __init__(
+        self,
+        artifact_dir: Optional[str] = None,
+        inference_workers: Optional[int] = None,
+        max_queue_depth: int = 64,
+        batch_max_wait_ms: float = 5.0,
+        batch_max_rows: int = 5000,
+        prediction_cache_entries: int = 100_000,
+        prediction_cache_ttl: float = 3600
+    ):
+        # Workers load models from disk, so keep a private artifact dir when none is configured
+        self._owns_artifact_dir = artifact_dir is None
+        self.artifact_dir = artifact_dir or tempfile.mkdtemp(prefix='sapience-models-')
+        
+        # Warm start from the latest saved artifact when one exists
+        if os.path.exists(os.path.join(self.artifact_dir, SAPienceMLService.ARTIFACT_LATEST)):
+            self.ml_service = SAPienceMLService.load(self.artifact_dir)
+        else:
+            self.ml_service = SAPienceMLService(MLModelType.HYBRID)
+        
+        # Only moves once an artifact is saved, so workers can always load it
+        self.model_version = self.ml_service.model_version
+        
+        self.max_queue_depth = max_queue_depth
+        self._pending = 0
+        
+        self._inference_executor = ProcessPoolExecutor(
+            max_workers=inference_workers or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_inference_worker,
+            initargs=(self.artifact_dir, prediction_cache_entries, prediction_cache_ttl)
+        )
+        self._training_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sapience-train')
+        
+        # Concurrent small requests share one inference call
+        self.coalescer = PredictionCoalescer(self._predict_batch, batch_max_wait_ms, batch_max_rows)
         
     async def train_models(self, sap_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Async training endpoint"""
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.ml_service.train, sap_data)
+        return await loop.run_in_executor(self._training_executor, self._train_and_publish, sap_data)
+    
+    def _train_and_publish(self, sap_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        results = self.ml_service.train(sap_data)
+        self.ml_service.save(self.artifact_dir)
+        self.model_version = self.ml_service.model_version
+        return results
     
     async def predict_pup(
         self, 
@@ -450,15 +1973,7 @@ class MLServiceAPI:
     ) -> List[Dict[str, Any]]:
         """Async prediction endpoint"""
         
-        horizon_enum = ForecastHorizon(horizon)
-        loop = asyncio.get_event_loop()
-        
-        predictions = await loop.run_in_executor(
-            None, 
-            self.ml_service.predict_pup, 
-            sap_data, 
-            horizon_enum
-        )
+        batch = await self.coalescer.submit(sap_data, ForecastHorizon(horizon))
         
         # Convert to dict format for JSON response
         return [
@@ -472,16 +1987,100 @@ class MLServiceAPI:
                 'classical_prediction': p.classical_prediction,
                 'quantum_optimization': p.quantum_optimization,
                 'model_type': p.model_type,
-                'quantum_states': p.quantum_states,
+                'quantum_states': list(p.quantum_states) if p.quantum_states is not None else None,
                 'features_importance': p.features_importance
             }
-            for p in predictions
+            for p in batch
         ]
+    
+    async def predict_pup_compact(
+        self, 
+        sap_data: List[Dict[str, Any]], 
+        horizon: str = "monthly"
+    ) -> Dict[str, Any]:
+        """Async prediction endpoint returning columns, with feature importance sent once"""
+        
+        batch = await self.coalescer.submit(sap_data, ForecastHorizon(horizon))
+        
+        return batch.to_dict()
+    
+    async def _predict_batch(
+        self,
+        sap_data: Union[List[Dict[str, Any]], pd.DataFrame],
+        horizon: ForecastHorizon
+    ) -> PredictionBatch:
+        """Run one prediction on the inference pool, moving the arrays through shared memory"""
+        if self.model_version is None:
+            raise ValueError("Models not trained. Call train() first.")
+        if self._pending >= self.max_queue_depth:
+            raise Exception(f"Inference queue full ({self._pending} requests pending), retry later")
+        
+        self._pending += 1
+        try:
+            frame = pd.DataFrame(sap_data).reset_index(drop=True)
+            # Keys stay objects so a numeric company code encodes as '1000', not '1000.0'
+            numeric_cols = [col for col in SAPienceMLService.NUMERIC_COLS if col in frame.columns]
+            object_cols = {col: frame[col].tolist() for col in frame.columns if col not in numeric_cols}
+            numeric = frame[numeric_cols].to_numpy(dtype=np.float64)
+            n_rows = len(frame)
+            
+            input_shm = shared_memory.SharedMemory(create=True, size=max(numeric.nbytes, 1))
+            output_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * INFERENCE_OUTPUT_COLUMNS * 8, 1))
+            try:
+                np.ndarray(numeric.shape, dtype=np.float64, buffer=input_shm.buf)[:] = numeric
+                
+                loop = asyncio.get_event_loop()
+                meta = await loop.run_in_executor(
+                    self._inference_executor,
+                    _predict_shared,
+                    self.artifact_dir,
+                    self.model_version,
+                    horizon.value,
+                    list(frame.columns),
+                    numeric_cols,
+                    object_cols,
+                    n_rows,
+                    input_shm.name,
+                    output_shm.name
+                )
+                
+                output = np.ndarray((n_rows, INFERENCE_OUTPUT_COLUMNS), dtype=np.float64, buffer=output_shm.buf).copy()
+            finally:
+                for shm in (input_shm, output_shm):
+                    shm.close()
+                    shm.unlink()
+        finally:
+            self._pending -= 1
+        
+        order = output[:, 0].astype(np.int64)
+        n_states = meta['n_states']
+        
+        return PredictionBatch(
+            material_number=frame['material'].to_numpy()[order],
+            company_code=frame['company_code'].to_numpy()[order],
+            plant=frame['plant'].to_numpy()[order],
+            period=frame['period'].to_numpy()[order],
+            predicted_pup=output[:, 1],
+            ci_lower=output[:, 2],
+            ci_upper=output[:, 3],
+            model_type=meta['model_type'],
+            classical_prediction=output[:, 4] if meta['has_classical'] else None,
+            quantum_optimization=output[:, 5] if meta['has_quantum'] else None,
+            quantum_probabilities=output[:, 6:6 + n_states] if n_states is not None else None,
+            features_importance=meta['features_importance'],
+            source_index=order
+        )
+    
+    def shutdown(self):
+        """Stop the worker pools (and drop the private artifact dir, if any)"""
+        self._inference_executor.shutdown(wait=True, cancel_futures=True)
+        self._training_executor.shutdown(wait=True)
+        if self._owns_artifact_dir:
+            shutil.rmtree(self.artifact_dir, ignore_errors=True)
 
 # CLI for testing
 if __name__ == "__main__":
     import argparse
-    import json
     
     # Sample SAP data for testing
     sample_data = [
@@ -509,16 +2108,24 @@ if __name__ == "__main__":
     parser.add_argument('--model-type', choices=['classical', 'quantum', 'hybrid'], default='hybrid')
     parser.add_argument('--train', action='store_true', help='Train models')
     parser.add_argument('--predict', action='store_true', help='Run predictions')
+    parser.add_argument('--model-dir', help='Load models from / save trained models to this artifact directory')
     
     args = parser.parse_args()
     
     async def main():
         ml_service = SAPienceMLService(MLModelType(args.model_type))
         
+        if args.model_dir and not args.train and os.path.exists(os.path.join(args.model_dir, SAPienceMLService.ARTIFACT_LATEST)):
+            ml_service = SAPienceMLService.load(args.model_dir)
+            print(f"Loaded models {ml_service.model_version}")
+        
         if args.train:
             print("Training models...")
             results = ml_service.train(sample_data)
             print("Training results:", json.dumps(results, indent=2))
+            
+            if args.model_dir:
+                print(f"Saved models to {ml_service.save(args.model_dir)}")
         
         if args.predict:
             if not ml_service.is_trained:
@@ -7,12 +7,49 @@ Based on Microsoft WhatTheHack SAP templates + existing OData setup
 import os
 import asyncio
 import aiohttp
+import base64
+import codecs
+import contextlib
+import hashlib
+import inspect
+import itertools
 import json
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, AsyncIterator, Callable, Iterable, Tuple
+from urllib.parse import parse_qsl, quote, unquote, urljoin, urlsplit
 from dataclasses import dataclass
 from enum import Enum
 
+# Columnar transformation (optional)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Local columnar store (optional)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+# Fast JSON decoding (optional)
+try:
+    import orjson
+    json_loads = orjson.loads
+    HAS_ORJSON = True
+except ImportError:
+    json_loads = json.loads
+    HAS_ORJSON = False
+
 class SAPEnvironment(Enum):
     DEV = "development"
     TEST = "test"
@@ -30,6 +67,34 @@ class SAPConfig:
     client_id: Optional[str] = None
     client_secret: Optional[str] = None
     tenant_id: Optional[str] = None
+    token_refresh_margin: int = 120  # Renew OAuth2 tokens this many seconds before expiry
+    
+    # Bulk extraction
+    max_concurrency: int = 8  # Parallel shard requests (pool allows 20 per host)
+    shard_size: int = 5000
+    key_fields: Tuple[str, ...] = ('CompanyCode', 'MaterialNumber', 'Plant', 'Period')
+    max_filter_length: int = 2048  # URL-encoded $filter length per request
+    watermark_field: str = "LastChangedAt"  # Change timestamp for incremental sync
+    
+    # $batch writes
+    batch_size: int = 100  # Operations per $batch request
+    batch_max_bytes: int = 4 * 1024 * 1024
+    
+    # Gateway protection: retries, adaptive concurrency, circuit breaker
+    max_retries: int = 3
+    retry_base_delay: float = 0.5  # Full-jitter backoff base (seconds)
+    retry_max_delay: float = 30.0
+    concurrency_initial: int = 8
+    concurrency_min: int = 1
+    concurrency_max: int = 20  # Matches limit_per_host of the connection pool
+    latency_target: float = 2.0  # Slower responses shrink the concurrency window
+    circuit_failure_threshold: int = 5  # Consecutive failures before opening
+    circuit_recovery_timeout: float = 30.0  # Seconds open before a half-open probe
+    stream_read_timeout: float = 60.0  # Max idle seconds between chunks of a streamed page
+    
+    # Response cache TTLs (seconds), see SAPConnector.cache
+    cache_ttl_open_period: int = 60
+    cache_ttl_closed_period: int = 24 * 3600
     
     @classmethod
     def from_env(cls, environment: SAPEnvironment = SAPEnvironment.PROD):
@@ -39,14 +104,429 @@ class SAPConfig:
             base_url=os.getenv(f"{prefix}BASE_URL", cls.base_url),
             odata_service=os.getenv(f"{prefix}ODATA_SERVICE", cls.odata_service),
             entity_set=os.getenv(f"{prefix}ENTITY_SET", cls.entity_set),
+            watermark_field=os.getenv(f"{prefix}WATERMARK_FIELD", cls.watermark_field),
             auth_type=os.getenv(f"{prefix}AUTH_TYPE", cls.auth_type),
             username=os.getenv(f"{prefix}USERNAME"),
             password=os.getenv(f"{prefix}PASSWORD"),
             client_id=os.getenv(f"{prefix}CLIENT_ID"),
             client_secret=os.getenv(f"{prefix}CLIENT_SECRET"),
-            tenant_id=os.getenv(f"{prefix}TENANT_ID")
+            tenant_id=os.getenv(f"{prefix}TENANT_ID"),
+            max_concurrency=int(os.getenv(f"{prefix}MAX_CONCURRENCY", cls.max_concurrency)),
+            shard_size=int(os.getenv(f"{prefix}SHARD_SIZE", cls.shard_size)),
+            batch_size=int(os.getenv(f"{prefix}BATCH_SIZE", cls.batch_size)),
+            max_filter_length=int(os.getenv(f"{prefix}MAX_FILTER_LENGTH", cls.max_filter_length)),
+            max_retries=int(os.getenv(f"{prefix}MAX_RETRIES", cls.max_retries)),
+            concurrency_max=int(os.getenv(f"{prefix}CONCURRENCY_MAX", cls.concurrency_max)),
+            latency_target=float(os.getenv(f"{prefix}LATENCY_TARGET", cls.latency_target)),
+            circuit_failure_threshold=int(os.getenv(f"{prefix}CIRCUIT_FAILURE_THRESHOLD", cls.circuit_failure_threshold)),
+            circuit_recovery_timeout=float(os.getenv(f"{prefix}CIRCUIT_RECOVERY_TIMEOUT", cls.circuit_recovery_timeout)),
+            stream_read_timeout=float(os.getenv(f"{prefix}STREAM_READ_TIMEOUT", cls.stream_read_timeout)),
+            cache_ttl_open_period=int(os.getenv(f"{prefix}CACHE_TTL_OPEN", cls.cache_ttl_open_period)),
+            cache_ttl_closed_period=int(os.getenv(f"{prefix}CACHE_TTL_CLOSED", cls.cache_ttl_closed_period))
         )
 
+@dataclass(frozen=True)
+class ColumnSpec:
+    """Typed mapping of one OData field to an ML column"""
+    source: str  # OData field
+    name: str  # Column name
+    dtype: str  # float64 | int64 | str
+    default: Any = None  # Fill value for missing / null values
+
+# Declared schema of SAPDataProcessor.process_quantum_optimization output
+PUP_COLUMN_SCHEMA = (
+    ColumnSpec('CompanyCode', 'company_code', 'str'),
+    ColumnSpec('MaterialNumber', 'material', 'str'),
+    ColumnSpec('PUPValue', 'current_pup', 'float64', 0.0),
+    ColumnSpec('StandardPrice', 'standard_price', 'float64', 0.0),
+    ColumnSpec('Quantity', 'quantity', 'int64', 0),
+    ColumnSpec('Plant', 'plant', 'str'),
+    ColumnSpec('Period', 'period', 'str')
+)
+
+# Fields read by SAPDataProcessor.process_quantum_optimization, for $select
+PUP_QUANTUM_FIELDS = tuple(spec.source for spec in PUP_COLUMN_SCHEMA)
+
+class PUPColumnBuilder:
+    """
+    Accumulates OData pages straight into typed NumPy column buffers
+    
+    Each page is converted column by column, so no per-row dict is built.
+    Numeric nulls take the column default; string nulls stay None.
+    """
+    
+    def __init__(self, schema: Tuple[ColumnSpec, ...] = PUP_COLUMN_SCHEMA):
+        if not HAS_NUMPY:
+            raise ImportError("numpy required for columnar PUP processing")
+        self.schema = schema
+        self.rows = 0
+        self._chunks: Dict[str, List["np.ndarray"]] = {spec.name: [] for spec in schema}
+        
+    def append_page(self, records: List[Dict[str, Any]]):
+        """Convert one page of OData records and append it"""
+        if not records:
+            return
+        for spec in self.schema:
+            values = [record.get(spec.source) for record in records]
+            self._chunks[spec.name].append(self._convert(values, spec))
+        self.rows += len(records)
+        
+    def finish(self) -> Dict[str, "np.ndarray"]:
+        """Concatenate buffered pages into one array per column"""
+        columns = {}
+        for spec in self.schema:
+            chunks = self._chunks[spec.name]
+            if chunks:
+                columns[spec.name] = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+            else:
+                columns[spec.name] = np.empty(0, dtype=object if spec.dtype == 'str' else spec.dtype)
+            # Release page buffers as soon as they are merged
+            self._chunks[spec.name] = []
+        return columns
+        
+    def to_arrow(self) -> "pa.Table":
+        """Finished columns as an Arrow table"""
+        if not HAS_ARROW:
+            raise ImportError("pyarrow required for Arrow output")
+        return pa.table(self.finish())
+        
+    @staticmethod
+    def _convert(values: List[Any], spec: ColumnSpec) -> "np.ndarray":
+        if spec.dtype == 'str':
+            return np.array(values, dtype=object)
+            
+        if any(value is None or value == '' for value in values):
+            values = [spec.default if value is None or value == '' else value for value in values]
+        # OData V2 sends decimals as strings; NumPy parses them in C
+        array = np.array(values, dtype=np.float64)
+        return array.astype(np.int64) if spec.dtype == 'int64' else array
+
+@dataclass
+class BatchItemResult:
+    """Outcome of one operation in an OData $batch write"""
+    operation: str  # create | update
+    index: int  # Position in the creates / updates input
+    key: Optional[str]
+    status: int  # HTTP status of the operation, 0 if the request never completed
+    success: bool
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+@dataclass
+class CacheEntry:
+    """Cached OData payload with its validator"""
+    payload: Any
+    etag: Optional[str]
+    expires_at: float  # Epoch seconds
+
+class ResponseCache:
+    """
+    Base class for SAPConnector response caches
+    
+    Entries are kept after expiry so they can be revalidated with
+    If-None-Match; backends only store and evict.
+    """
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+        
+    def set(self, key: str, entry: CacheEntry):
+        raise NotImplementedError
+        
+    def clear(self):
+        raise NotImplementedError
+        
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters; revalidations are stale entries confirmed by a 304"""
+        lookups = self.hits + self.misses + self.revalidations
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'hit_ratio': (self.hits + self.revalidations) / lookups if lookups else 0.0
+        }
+
+class MemoryLRUCache(ResponseCache):
+    """In-process LRU cache; payloads are shared, so callers must not mutate them"""
+    
+    def __init__(self, max_entries: int = 256):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+        
+    def set(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            
+    def clear(self):
+        self._entries.clear()
+
+class DiskCache(ResponseCache):
+    """On-disk cache, one JSON file per entry, shared across processes"""
+    
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+        
+    def get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+            
+    def set(self, key: str, entry: CacheEntry):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry.__dict__, f)
+        # Atomic swap so concurrent readers never see a partial file
+        os.replace(tmp_path, path)
+        
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+class ODataStreamDecoder:
+    """
+    Incremental decoder for the `d.results[]` / `value[]` array of an OData page
+    
+    Bytes are fed as they arrive and complete records are returned as soon as
+    their closing brace is seen, so neither the body nor the parsed page is
+    held in memory. Continuation and delta links outside the array are
+    collected into `links` ('next', 'delta') when the stream is closed.
+    With orjson installed, the run of complete records in each chunk is
+    decoded by a single orjson call; the stdlib decoder handles the rest.
+    """
+    
+    ARRAY_START = re.compile(r'"(?:results|value)"\s*:\s*\[')
+    LINK_PATTERNS = {
+        'next': re.compile(r'"(?:__next|@odata\.nextLink|odata\.nextLink)"\s*:\s*("(?:[^"\\]|\\.)*")'),
+        'delta': re.compile(r'"(?:__delta|@odata\.deltaLink|odata\.deltaLink)"\s*:\s*("(?:[^"\\]|\\.)*")')
+    }
+    
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._state = "head"  # head -> items -> tail
+        self._outside = []  # Text around the array, scanned for links
+        self.links: Dict[str, str] = {}
+        
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """Consume a chunk, returning the records it completed"""
+        self._buffer += self._utf8.decode(chunk)
+        return self._drain(final=False)
+        
+    def close(self) -> List[Dict[str, Any]]:
+        """Finish the stream, returning remaining records and filling `links`"""
+        self._buffer += self._utf8.decode(b"", final=True)
+        records = self._drain(final=True)
+        
+        if self._state == "head":
+            # No results array (single entity or unexpected shape): decode whole body
+            data = json_loads(self._buffer) if self._buffer.strip() else []
+            self._buffer = ""
+            self.links = {
+                name: link for name, link in (
+                    ('next', SAPConnector._extract_next_link(data)),
+                    ('delta', SAPConnector._extract_delta_link(data))
+                ) if link
+            }
+            return SAPConnector._extract_results(data)
+            
+        if self._state == "items":
+            raise ValueError("Truncated OData response: results array not closed")
+            
+        self._outside.append(self._buffer)
+        outside = "".join(self._outside)
+        for name, pattern in self.LINK_PATTERNS.items():
+            match = pattern.search(outside)
+            if match:
+                self.links[name] = json.loads(match.group(1))
+        return records
+        
+    def _drain(self, final: bool) -> List[Dict[str, Any]]:
+        records = []
+        buffer = self._buffer
+        
+        if self._state == "head":
+            match = self.ARRAY_START.search(buffer)
+            if not match:
+                return records
+            self._outside.append(buffer[:match.start()])
+            buffer = buffer[match.end():]
+            self._state = "items"
+            
+        position = 0
+        batched = HAS_ORJSON
+        if self._state == "items":
+            length = len(buffer)
+            while True:
+                while position < length and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position >= length:
+                    break
+                if buffer[position] == "]":
+                    self._state = "tail"
+                    position += 1
+                    break
+                if batched and buffer[position] == "{":
+                    end = self._batch_end(buffer, position)
+                    if end > position:
+                        try:
+                            records.extend(json_loads(f"[{buffer[position:end]}]"))
+                            position = end
+                            continue
+                        except ValueError:
+                            # Cut inside a record (e.g. "}, {" in a string): decode one by one
+                            batched = False
+                try:
+                    record, position = self._decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    # Record split across chunks: wait for more data
+                    break
+                records.append(record)
+                
+        self._buffer = buffer[position:]
+        if self._state == "tail":
+            # Keep only the small trailer after the array
+            self._outside.append(self._buffer)
+            self._buffer = ""
+        return records
+        
+    @staticmethod
+    def _batch_end(buffer: str, position: int, attempts: int = 8) -> int:
+        """
+        Index just past the last closing brace after `position` that is
+        followed by `, {` or `]`, i.e. probably ends a record; -1 if none
+        
+        A wrong guess cannot decode as an array, so the caller's orjson call
+        doubles as the check.
+        """
+        end = len(buffer)
+        for _ in range(attempts):
+            end = buffer.rfind("}", position, end)
+            if end < 0:
+                return -1
+            peek = buffer[end + 1:end + 16].lstrip(" \t\r\n")
+            if peek[:1] == "]" or (peek[:1] == "," and peek[1:].lstrip(" \t\r\n")[:1] in ("", "{")):
+                return end + 1
+        return -1
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on in-flight gateway requests
+    
+    The window grows by about one request per window of successes and is
+    halved (at most once per latency_target) when responses are slow,
+    throttled or failing.
+    """
+    
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.inflight = 0
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+        
+    async def acquire(self):
+        while self.inflight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.inflight += 1
+        
+    def release(self, latency: float, overloaded: bool):
+        self.inflight -= 1
+        now = time.monotonic()
+        
+        if overloaded or latency > self.latency_target:
+            if now - self._last_decrease >= self.latency_target:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            
+        for _ in range(max(int(self.limit) - self.inflight, 0)):
+            if not self._waiters:
+                break
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+            
+        return self.state == self.CLOSED
+        
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+        
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+            
+    def release_probe(self):
+        """Give back a half-open probe that ended without an outcome"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
 class SAPConnector:
     """
     Production-ready SAP connector with:
@@ -57,11 +537,31 @@ class SAPConnector:
     - Multi-tenant support
     """
     
-    def __init__(self, config: SAPConfig):
+    def __init__(self, config: SAPConfig, cache: Optional[ResponseCache] = None):
         self.config = config
+        self.cache = cache
         self.session: Optional[aiohttp.ClientSession] = None
         self.auth_token: Optional[str] = None
         self.token_expires: Optional[datetime] = None
+        self.csrf_token: Optional[str] = None
+        self._csrf_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._auth_lock = asyncio.Lock()
+        self._token_refresher: Optional[asyncio.Task] = None
+        self._basic_auth_header = self._build_basic_auth_header()
+        self.limiter = AdaptiveConcurrencyLimiter(
+            config.concurrency_initial,
+            config.concurrency_min,
+            config.concurrency_max,
+            config.latency_target
+        )
+        self.circuit_breaker = CircuitBreaker(
+            config.circuit_failure_threshold,
+            config.circuit_recovery_timeout
+        )
         
     async def __aenter__(self):
         """Async context manager entry"""
@@ -86,6 +586,8 @@ class SAPConnector:
         self.session = aiohttp.ClientSession(
             connector=connector,
             timeout=timeout,
+            # CSRF tokens are bound to the session cookie; accept cookies from IP hosts too
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
             headers={
                 'User-Agent': 'SAPience-Connector/3.0',
                 'Accept': 'application/json',
@@ -93,18 +595,58 @@ class SAPConnector:
             }
         )
         
+        self._loop = asyncio.get_running_loop()
+        
         # Authenticate based on config
         if self.config.auth_type == "oauth2":
-            await self._authenticate_oauth2()
+            await self._refresh_token()
+            self._token_refresher = asyncio.ensure_future(self._token_refresh_loop())
         elif self.config.auth_type == "saml":
             await self._authenticate_saml()
         # Basic auth handled per request
             
-    async def disconnect(self):
-        """Clean up connections"""
+    async def disconnect(self, drain_timeout: Optional[float] = None):
+        """Clean up connections, optionally waiting for in-flight requests first"""
+        if drain_timeout and self._inflight:
+            try:
+                await asyncio.wait_for(self._idle.wait(), drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self._token_refresher is not None:
+            self._token_refresher.cancel()
+            self._token_refresher = None
         if self.session:
             await self.session.close()
             
+    def is_healthy(self) -> bool:
+        """Session open and bound to the running event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return self.session is not None and not self.session.closed and self._loop is loop
+        
+    async def ping(self) -> bool:
+        """Probe the gateway with a service document request"""
+        url = f"{self.config.base_url}{self.config.odata_service}"
+        try:
+            await self._get_with_retry(url, {'$format': 'json'}, self._read_text, max_retries=0)
+            return True
+        except Exception:
+            return False
+            
+    @contextlib.contextmanager
+    def _track_request(self):
+        """Count in-flight requests so disconnect can drain them"""
+        self._inflight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.set()
+            
     async def _authenticate_oauth2(self):
         """OAuth2 authentication for BTP"""
         if not all([self.config.client_id, self.config.client_secret]):
@@ -121,8 +663,9 @@ class SAPConnector:
             if resp.status == 200:
                 token_data = await resp.json()
                 self.auth_token = token_data['access_token']
-                # Calculate expiry (subtract 5 minutes for safety)
-                expires_in = token_data.get('expires_in', 3600) - 300
+                # Calculate expiry (subtract 5 minutes for safety, at most half the lifetime)
+                expires_in = token_data.get('expires_in', 3600)
+                expires_in = max(expires_in - 300, expires_in // 2)
                 self.token_expires = datetime.now() + timedelta(seconds=expires_in)
             else:
                 raise Exception(f"OAuth2 authentication failed: {resp.status}")
@@ -133,22 +676,59 @@ class SAPConnector:
         # This would integrate with your identity provider
         pass
         
+    def _token_expired(self) -> bool:
+        return not self.auth_token or bool(
+            self.token_expires and datetime.now() >= self.token_expires
+        )
+        
+    async def _refresh_token(self, stale_token: Optional[str] = None):
+        """
+        Single-flight OAuth2 refresh
+        
+        Concurrent callers wait on one lock; whoever gets it second finds a
+        token newer than the one they saw fail and returns without a request.
+        """
+        async with self._auth_lock:
+            if not self._token_expired() and self.auth_token != stale_token:
+                return
+            await self._authenticate_oauth2()
+            
+    async def _token_refresh_loop(self):
+        """Renew the token ahead of expiry so requests never wait on /oauth/token"""
+        while True:
+            delay = self.config.token_refresh_margin
+            if self.token_expires:
+                delay = (self.token_expires - datetime.now()).total_seconds() - self.config.token_refresh_margin
+            await asyncio.sleep(max(delay, 1))
+            
+            try:
+                await self._refresh_token(stale_token=self.auth_token)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Requests fall back to refreshing on expiry; try again shortly
+                await asyncio.sleep(min(30, self.config.token_refresh_margin))
+                
+    def _build_basic_auth_header(self) -> Optional[str]:
+        """Basic credentials are static, so encode them once"""
+        if self.config.auth_type == "basic" and self.config.username and self.config.password:
+            credentials = base64.b64encode(
+                f"{self.config.username}:{self.config.password}".encode()
+            ).decode()
+            return f'Basic {credentials}'
+        return None
+        
     async def _get_auth_headers(self) -> Dict[str, str]:
         """Get appropriate auth headers based on config"""
         headers = {}
         
         if self.config.auth_type == "oauth2":
-            if not self.auth_token or (self.token_expires and datetime.now() >= self.token_expires):
-                await self._authenticate_oauth2()
+            if self._token_expired():
+                await self._refresh_token(self.auth_token)
             headers['Authorization'] = f'Bearer {self.auth_token}'
             
-        elif self.config.auth_type == "basic":
-            if self.config.username and self.config.password:
-                import base64
-                credentials = base64.b64encode(
-                    f"{self.config.username}:{self.config.password}".encode()
-                ).decode()
-                headers['Authorization'] = f'Basic {credentials}'
+        elif self._basic_auth_header:
+            headers['Authorization'] = self._basic_auth_header
                 
         return headers
         
@@ -159,7 +739,8 @@ class SAPConnector:
         plants: List[str] = None,
         period_from: str = None,
         period_to: str = None,
-        limit: int = 1000
+        limit: int = 1000,
+        select: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         Query PUP optimization data with filters
@@ -171,25 +752,473 @@ class SAPConnector:
             period_from: Start period (YYYY-MM)
             period_to: End period (YYYY-MM)
             limit: Maximum records to return
+            select: Fields to return ($select), e.g. PUP_QUANTUM_FIELDS
             
         Returns:
             List of PUP records
         """
         
+        url = self._entity_set_url()
+        plan = self._plan_pup_queries(
+            company_codes, materials, plants, period_from, period_to, top=limit, select=select
+        )
+        
+        if len(plan) > 1:
+            # Value lists too long for one URL
+            records = await self.query_pup_data_planned(
+                company_codes, materials, plants, period_from, period_to,
+                select=select, max_records=limit
+            )
+            return records[:limit]
+            
+        # Execute request with retry logic
+        return await self._execute_request_with_retry(url, plan[0])
+        
+    async def iter_pup_data(
+        self,
+        company_codes: List[str] = None,
+        materials: List[str] = None,
+        plants: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        page_size: int = 5000,
+        max_records: Optional[int] = None,
+        select: Optional[List[str]] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream PUP optimization data page by page
+        
+        Follows server-driven continuation links (`__next`, `@odata.nextLink`,
+        `$skiptoken`) and falls back to `$skip` paging when the gateway returns
+        a full page without one. The next page is fetched while the caller
+        works on the current one, so at most two pages are held in memory.
+        
+        Args:
+            company_codes, materials, plants, period_from, period_to:
+                Same filters as query_pup_data
+            page_size: Records requested per page
+            max_records: Stop after this many records (None = all)
+            select: Fields to return ($select)
+            
+        Yields:
+            Lists of PUP records, one per page
+        """
+        url = self._entity_set_url()
+        params = self._build_pup_params(
+            company_codes, materials, plants, period_from, period_to, top=page_size, select=select
+        )
+        async for records in self._iter_pages(url, params, page_size, max_records):
+            yield records
+            
+    async def _iter_pages(
+        self,
+        url: str,
+        params: Dict[str, str],
+        page_size: int,
+        max_records: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Page through a query, prefetching the next page while yielding"""
+        fetched = 0
+        skip = 0
+        next_task = asyncio.ensure_future(self._fetch_page(url, params))
+        
+        try:
+            while next_task is not None:
+                records, next_link = await next_task
+                next_task = None
+                fetched += len(records)
+                skip += len(records)
+                
+                if max_records is not None and fetched >= max_records:
+                    # Trim the last page and stop paging
+                    records = records[:len(records) - (fetched - max_records)]
+                elif next_link:
+                    next_task = asyncio.ensure_future(self._fetch_page(next_link, None))
+                elif records and len(records) >= page_size:
+                    # No continuation link but a full page: client-driven paging
+                    next_task = asyncio.ensure_future(
+                        self._fetch_page(url, {**params, '$skip': str(skip)})
+                    )
+                    
+                if records:
+                    yield records
+        finally:
+            if next_task is not None:
+                self._discard_task(next_task)
+                
+    async def query_pup_data_planned(
+        self,
+        company_codes: List[str] = None,
+        materials: List[str] = None,
+        plants: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        select: Optional[List[str]] = None,
+        page_size: int = 5000,
+        max_records: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Query PUP data with arbitrarily long value lists
+        
+        The filter is compiled into sub-queries whose `$filter` fits within
+        `config.max_filter_length`. Sub-queries run concurrently and their
+        results are merged and de-duplicated on `config.key_fields`.
+        
+        Args:
+            company_codes, materials, plants, period_from, period_to:
+                Same filters as query_pup_data
+            select: Fields to return ($select); key fields are always added
+            page_size: Records per page within a sub-query
+            max_records: Per sub-query record cap (None = all)
+            max_concurrency: Sub-queries in flight (defaults to config.max_concurrency)
+            
+        Returns:
+            De-duplicated PUP records
+        """
+        url = self._entity_set_url()
+        plan = self._plan_pup_queries(
+            company_codes, materials, plants, period_from, period_to, top=page_size, select=select
+        )
+        semaphore = asyncio.Semaphore(max_concurrency or self.config.max_concurrency)
+        
+        async def run(params: Dict[str, str]) -> List[Dict[str, Any]]:
+            records = []
+            async with semaphore:
+                async for page in self._iter_pages(url, params, page_size, max_records):
+                    records.extend(page)
+            return records
+            
+        tasks = [asyncio.ensure_future(run(params)) for params in plan]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                self._discard_task(task)
+                
+        # Merge and dedupe by key
+        merged = {}
+        for records in results:
+            for record in records:
+                key = tuple(record.get(field) for field in self.config.key_fields)
+                merged.setdefault(key, record)
+        return list(merged.values())
+        
+    def _plan_pup_queries(
+        self,
+        company_codes: List[str] = None,
+        materials: List[str] = None,
+        plants: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        top: Optional[int] = None,
+        select: Optional[List[str]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Compile filters into one or more URL-safe query parameter sets
+        
+        Each value list is packed into chunks by the measured encoded width
+        of its values. While the worst-case `$filter` is too long, the widest
+        list that can still be split is re-packed just narrow enough to fit
+        `config.max_filter_length` (or down to one value per chunk). The
+        sub-queries are the cross product of the chunks.
+        """
+        if select:
+            # Keys are needed to merge sub-query results
+            select = list(dict.fromkeys([*select, *self.config.key_fields]))
+            
+        dimensions = [
+            ('CompanyCode', list(dict.fromkeys(company_codes or []))),
+            ('MaterialNumber', list(dict.fromkeys(materials or []))),
+            ('Plant', list(dict.fromkeys(plants or [])))
+        ]
+        
+        # Period clauses and " and " separators are shared by every sub-query
+        fixed_length = len(quote(self._build_pup_params(
+            period_from=period_from, period_to=period_to
+        ).get('$filter', ''), safe=''))
+        separator_length = len(quote(' and ', safe=''))
+        
+        # Percent-encoding is per character, so a chunk's encoded width is the
+        # sum of its parts: "(" + terms joined by " or " + ")"
+        brackets_length = len(quote('()', safe=''))
+        or_length = len(quote(' or ', safe=''))
+        term_widths = [
+            [len(quote(self._in_filter(field, [value]), safe='')) - brackets_length for value in values]
+            for field, values in dimensions
+        ]
+        
+        def pack(values: List[str], widths: List[int], budget: float) -> Tuple[List[List[str]], int]:
+            """Greedily fill chunks up to `budget` encoded characters; returns chunks and widest"""
+            if not values:
+                return [[]], 0
+            chunks, chunk, width, widest = [], [], 0, 0
+            for value, term in zip(values, widths):
+                added = term + (or_length if chunk else brackets_length)
+                if chunk and width + added > budget:
+                    chunks.append(chunk)
+                    widest = max(widest, width)
+                    chunk, width, added = [], 0, term + brackets_length
+                chunk.append(value)
+                width += added
+            chunks.append(chunk)
+            return chunks, max(widest, width)
+            
+        packed = [pack(values, widths, float('inf')) for (_, values), widths in zip(dimensions, term_widths)]
+        chunks = [dim_chunks for dim_chunks, _ in packed]
+        widths = [width for _, width in packed]
+        # Narrowest possible chunk: one value
+        min_widths = [max(dim_widths, default=-brackets_length) + brackets_length for dim_widths in term_widths]
+        
+        while True:
+            clauses = sum(1 for width in widths if width) + (1 if fixed_length else 0)
+            length = fixed_length + sum(widths) + separator_length * max(clauses - 1, 0)
+            excess = length - self.config.max_filter_length
+            if excess <= 0:
+                break
+                
+            splittable = [i for i, width in enumerate(widths) if width > min_widths[i]]
+            if not splittable:
+                raise ValueError(
+                    f"$filter cannot fit in {self.config.max_filter_length} characters"
+                )
+            widest = max(splittable, key=lambda i: widths[i])
+            budget = max(widths[widest] - excess, min_widths[widest])
+            chunks[widest], widths[widest] = pack(dimensions[widest][1], term_widths[widest], budget)
+            
+        return [
+            self._build_pup_params(
+                company_chunk or None, material_chunk or None, plant_chunk or None,
+                period_from, period_to, top=top, select=select
+            )
+            for company_chunk, material_chunk, plant_chunk in itertools.product(*chunks)
+        ]
+        
+    async def iter_pup_records(
+        self,
+        company_codes: List[str] = None,
+        materials: List[str] = None,
+        plants: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        page_size: int = 5000,
+        select: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream PUP records one by one, decoding pages incrementally
+        
+        Unlike iter_pup_data, pages are never materialized: records are
+        parsed from the response body as it arrives, so memory stays bounded
+        by a few network chunks even for very large pages. Responses are not
+        cached on this path.
+        
+        Args:
+            company_codes, materials, plants, period_from, period_to:
+                Same filters as query_pup_data
+            page_size: Records requested per page
+            select: Fields to return ($select)
+            
+        Yields:
+            PUP records
+        """
+        base_url = url = self._entity_set_url()
+        base_params = params = self._build_pup_params(
+            company_codes, materials, plants, period_from, period_to, top=page_size, select=select
+        )
+        skip = 0
+        
+        while url:
+            links: Dict[str, str] = {}
+            count = 0
+            async for record in self._stream_records(url, params, links):
+                count += 1
+                yield record
+            skip += count
+            
+            if links.get('next'):
+                url, params = urljoin(url, links['next']), None
+            elif count >= page_size:
+                # No continuation link but a full page: client-driven paging
+                url, params = base_url, {**base_params, '$skip': str(skip)}
+            else:
+                url = None
+                
+    async def _stream_records(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]],
+        links: Dict[str, str]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the records of one page through the guarded GET path
+        
+        The response is decoded in a background task that hands record
+        batches over a bounded queue. Failures before the first record are
+        retried as usual; once records have been handed out a failure is
+        raised instead of retried, to avoid duplicates.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+        
+        async def reader(resp: aiohttp.ClientResponse) -> Dict[str, str]:
+            decoder = ODataStreamDecoder()
+            emitted = False
+            try:
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    records = decoder.feed(chunk)
+                    if records:
+                        emitted = True
+                        await queue.put(records)
+                records = decoder.close()
+                if records:
+                    await queue.put(records)
+            except Exception as e:
+                if emitted:
+                    # Not a ClientError/TimeoutError, so _get_with_retry won't retry it
+                    raise Exception(f"Stream interrupted after partial page: {str(e)}") from e
+                raise
+            return decoder.links
+            
+        task = asyncio.ensure_future(self._get_with_retry(url, params, reader, stream=True))
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    for record in getter.result():
+                        yield record
+                    continue
+                    
+                getter.cancel()
+                while not queue.empty():
+                    for record in queue.get_nowait():
+                        yield record
+                links.update(task.result())
+                return
+        finally:
+            self._discard_task(task)
+            
+    async def count_pup_data(
+        self,
+        company_codes: List[str] = None,
+        materials: List[str] = None,
+        plants: List[str] = None,
+        period_from: str = None,
+        period_to: str = None
+    ) -> int:
+        """Count PUP records matching the filters using `$count`"""
+        url = f"{self._entity_set_url()}/$count"
+        params = self._build_pup_params(
+            company_codes, materials, plants, period_from, period_to
+        )
+        # $count returns text/plain; $format is not allowed on it
+        params.pop('$format', None)
+        
+        text = await self._get_with_retry(url, params, self._read_text)
+        return int(text.strip())
+        
+    async def query_pup_data_parallel(
+        self,
+        company_codes: List[str] = None,
+        materials: List[str] = None,
+        plants: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        shard_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        on_shard: Optional[Callable[[int, List[Dict[str, Any]]], Any]] = None,
+        select: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract PUP data as concurrent `$skip/$top` shards
+        
+        Reads `$count` for the filter, splits the range into shards ordered by
+        `SAPConfig.key_fields` and fetches them over the shared connection pool
+        with at most `max_concurrency` requests in flight.
+        
+        Args:
+            company_codes, materials, plants, period_from, period_to:
+                Same filters as query_pup_data
+            shard_size: Records per shard (defaults to config.shard_size)
+            max_concurrency: Shards in flight (defaults to config.max_concurrency)
+            on_shard: Optional callback (shard_index, records), sync or async,
+                called as each shard completes. Records are then not retained
+                and an empty list is returned.
+            select: Fields to return ($select)
+                
+        Returns:
+            All records in key order, unless on_shard is given
+        """
+        shard_size = shard_size or self.config.shard_size
+        max_concurrency = max_concurrency or self.config.max_concurrency
+        
+        total = await self.count_pup_data(
+            company_codes, materials, plants, period_from, period_to
+        )
+        if total == 0:
+            return []
+            
+        url = self._entity_set_url()
+        params = self._build_pup_params(
+            company_codes, materials, plants, period_from, period_to, top=shard_size, select=select
+        )
+        # Stable ordering so shards neither overlap nor miss rows
+        params['$orderby'] = ','.join(self.config.key_fields)
+        
+        offsets = list(range(0, total, shard_size))
+        shards: List[Optional[List[Dict[str, Any]]]] = [None] * len(offsets)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def fetch_shard(index: int, skip: int):
+            async with semaphore:
+                records = await self._fetch_all_pages(url, {**params, '$skip': str(skip)})
+            if on_shard is not None:
+                result = on_shard(index, records)
+                if inspect.isawaitable(result):
+                    await result
+            else:
+                shards[index] = records
+                
+        tasks = [
+            asyncio.ensure_future(fetch_shard(index, skip))
+            for index, skip in enumerate(offsets)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                self._discard_task(task)
+                
+        if on_shard is not None:
+            return []
+        return [record for shard in shards for record in shard]
+        
+    def _entity_set_url(self) -> str:
+        """Full URL of the configured entity set"""
+        return f"{self.config.base_url}{self.config.odata_service}{self.config.entity_set}"
+        
+    def _build_pup_params(
+        self,
+        company_codes: List[str] = None,
+        materials: List[str] = None,
+        plants: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        top: Optional[int] = None,
+        select: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """Build OData query parameters for PUP queries"""
+        
         # Build OData filter
         filters = []
         
         if company_codes:
-            company_filter = " or ".join([f"CompanyCode eq '{cc}'" for cc in company_codes])
-            filters.append(f"({company_filter})")
+            filters.append(self._in_filter('CompanyCode', company_codes))
             
         if materials:
-            material_filter = " or ".join([f"MaterialNumber eq '{mat}'" for mat in materials])
-            filters.append(f"({material_filter})")
+            filters.append(self._in_filter('MaterialNumber', materials))
             
         if plants:
-            plant_filter = " or ".join([f"Plant eq '{plant}'" for plant in plants])
-            filters.append(f"({plant_filter})")
+            filters.append(self._in_filter('Plant', plants))
             
         if period_from:
             filters.append(f"Period ge '{period_from}'")
@@ -197,68 +1226,300 @@ class SAPConnector:
         if period_to:
             filters.append(f"Period le '{period_to}'")
             
-        # Construct URL
-        url = f"{self.config.base_url}{self.config.odata_service}{self.config.entity_set}"
+        params = {'$format': 'json'}
         
-        params = {
-            '$format': 'json',
-            '$top': str(limit)
-        }
+        if top is not None:
+            params['$top'] = str(top)
         
         if filters:
             params['$filter'] = ' and '.join(filters)
             
-        # Execute request with retry logic
-        return await self._execute_request_with_retry(url, params)
+        if select:
+            params['$select'] = ','.join(select)
+            
+        return params
         
+    @staticmethod
+    def _in_filter(field: str, values: List[str]) -> str:
+        """OData V2 has no `in` operator, so compile a value list to an OR chain"""
+        clauses = " or ".join(
+            f"{field} eq '{str(value).replace(chr(39), chr(39) * 2)}'" for value in values
+        )
+        return f"({clauses})"
+        
+    @staticmethod
+    def _discard_task(task: asyncio.Future):
+        """Cancel a prefetch task without leaking its exception"""
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+            
     async def _execute_request_with_retry(
         self, 
         url: str, 
         params: Dict[str, str], 
-        max_retries: int = 3
+        max_retries: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """Execute request with exponential backoff retry"""
+        data = await self._get_json_with_retry(url, params, max_retries)
+        return self._extract_results(data)
         
-        for attempt in range(max_retries + 1):
-            try:
-                auth_headers = await self._get_auth_headers()
+    async def _fetch_all_pages(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """Fetch a request and any server-driven continuation pages"""
+        first_page, next_link = await self._fetch_page(url, params)
+        # Copy so cached pages are never mutated
+        records = list(first_page)
+        while next_link:
+            page, next_link = await self._fetch_page(next_link, None)
+            records.extend(page)
+        return records
+        
+    async def _fetch_page(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Fetch one page and return its records plus the absolute next link"""
+        data = await self._get_json_with_retry(url, params)
+        next_link = self._extract_next_link(data)
+        if next_link:
+            next_link = urljoin(url, next_link)
+        return self._extract_results(data), next_link
+        
+    @staticmethod
+    def _extract_results(data: Any) -> List[Dict[str, Any]]:
+        """Extract results from OData response"""
+        if isinstance(data, dict):
+            if 'd' in data and 'results' in data['d']:
+                return data['d']['results']
+            elif 'value' in data:
+                return data['value']
+        return [data] if isinstance(data, dict) else data
+        
+    @staticmethod
+    def _extract_delta_link(data: Any) -> Optional[str]:
+        """Extract the delta link from the last page of an OData V2 or V4 response"""
+        if not isinstance(data, dict):
+            return None
+        if isinstance(data.get('d'), dict):
+            return data['d'].get('__delta')
+        return data.get('@odata.deltaLink') or data.get('odata.deltaLink')
+        
+    @staticmethod
+    def _extract_next_link(data: Any) -> Optional[str]:
+        """Extract the continuation link from an OData V2 or V4 response"""
+        if not isinstance(data, dict):
+            return None
+        if isinstance(data.get('d'), dict):
+            return data['d'].get('__next')
+        return data.get('@odata.nextLink') or data.get('odata.nextLink')
+        
+    async def _get_json_with_retry(
+        self, 
+        url: str, 
+        params: Optional[Dict[str, str]], 
+        max_retries: Optional[int] = None
+    ) -> Any:
+        """GET a JSON payload with exponential backoff retry, through the cache if set"""
+        if self.cache is None:
+            return await self._get_with_retry(url, params, self._read_json, max_retries)
+            
+        key = self._cache_key(url, params)
+        entry = self.cache.get(key)
+        now = time.time()
+        
+        if entry is not None and entry.expires_at > now:
+            self.cache.hits += 1
+            return entry.payload
+            
+        # Stale entries with an ETag are revalidated instead of refetched
+        headers = {'If-None-Match': entry.etag} if entry is not None and entry.etag else None
+        status, etag, payload = await self._get_with_retry(
+            url, params, self._read_json_conditional, max_retries,
+            headers=headers, ok_statuses=(200, 304)
+        )
+        
+        if status == 304:
+            self.cache.revalidations += 1
+            payload, etag = entry.payload, etag or entry.etag
+        else:
+            self.cache.misses += 1
+            
+        self.cache.set(key, CacheEntry(
+            payload=payload,
+            etag=etag,
+            expires_at=now + self._cache_ttl(url, params)
+        ))
+        return payload
+        
+    def cache_stats(self) -> Dict[str, Any]:
+        """Response cache hit/miss counters"""
+        return self.cache.stats() if self.cache is not None else {}
+        
+    def _cache_key(self, url: str, params: Optional[Dict[str, str]]) -> str:
+        """Hash of the normalized URL, sorted query params and caller identity"""
+        parts = urlsplit(url)
+        query = sorted(parse_qsl(parts.query, keep_blank_values=True) + list((params or {}).items()))
+        normalized = json.dumps([
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path,
+            query,
+            # Different principals may be authorized for different rows
+            self.config.username or self.config.client_id
+        ])
+        return hashlib.sha256(normalized.encode()).hexdigest()
+        
+    def _cache_ttl(self, url: str, params: Optional[Dict[str, str]]) -> int:
+        """Long TTL when the query only covers closed periods, short otherwise"""
+        filter_text = (params or {}).get('$filter') or dict(
+            parse_qsl(urlsplit(url).query)
+        ).get('$filter', '')
+        upper_periods = re.findall(r"Period (?:le|eq|lt) '(\d{4}-\d{2})'", filter_text)
+        
+        if upper_periods and max(upper_periods) < datetime.now().strftime("%Y-%m"):
+            return self.config.cache_ttl_closed_period
+        return self.config.cache_ttl_open_period
+        
+    @staticmethod
+    async def _read_json(resp: aiohttp.ClientResponse) -> Any:
+        return await resp.json(loads=json_loads)
+        
+    @staticmethod
+    async def _read_json_conditional(resp: aiohttp.ClientResponse) -> Tuple[int, Optional[str], Any]:
+        payload = await resp.json(loads=json_loads) if resp.status == 200 else None
+        return resp.status, resp.headers.get('ETag'), payload
+        
+    @staticmethod
+    async def _read_text(resp: aiohttp.ClientResponse) -> str:
+        return await resp.text()
+        
+    async def _get_with_retry(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]],
+        reader: Callable[[aiohttp.ClientResponse], Any],
+        max_retries: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None,
+        ok_statuses: Tuple[int, ...] = (200,),
+        stream: bool = False
+    ) -> Any:
+        """
+        GET with retry, decoding `ok_statuses` responses with `reader`
+        
+        Requests pass the circuit breaker and the adaptive concurrency
+        limiter; 429/5xx and connection errors are retried with full-jitter
+        backoff, honoring Retry-After.
+        
+        With `stream`, the body is read at the consumer's pace: the request
+        uses an idle read timeout instead of the session's total timeout, and
+        its limiter slot is released with the latency to response headers.
+        """
+        if max_retries is None:
+            max_retries = self.config.max_retries
+        timeout = None
+        if stream:
+            timeout = aiohttp.ClientTimeout(
+                total=None, connect=10, sock_read=self.config.stream_read_timeout
+            )
+            
+        with self._track_request():
+            for attempt in range(max_retries + 1):
+                if not self.circuit_breaker.allow():
+                    raise Exception(f"Circuit open for {self.config.base_url}, request not sent")
+                # A probe cancelled or failing outside the HTTP exchange (auth,
+                # decoding) must not keep the circuit half-open forever
+                probe = self.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+                    
+                retry_after = None
+                overloaded = False
+                await self.limiter.acquire()
+                slot_held = True
+                started = time.monotonic()
                 
-                async with self.session.get(url, params=params, headers=auth_headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        # Extract results from OData response
-                        if 'd' in data and 'results' in data['d']:
-                            return data['d']['results']
-                        elif 'value' in data:
-                            return data['value']
-                        else:
-                            return [data] if isinstance(data, dict) else data
+                try:
+                    auth_headers = await self._get_auth_headers()
+                    request_headers = {**auth_headers, **(headers or {})}
+                    request_kwargs = {'timeout': timeout} if timeout else {}
+                
+                    async with self.session.get(
+                        url, params=params, headers=request_headers, **request_kwargs
+                    ) as resp:
+                        if resp.status in ok_statuses:
+                            if stream:
+                                self.limiter.release(time.monotonic() - started, False)
+                                slot_held = False
+                            result = await reader(resp)
+                            self.circuit_breaker.record_success()
+                            return result
                             
-                    elif resp.status == 401:
-                        # Auth failed, retry with fresh token
-                        self.auth_token = None
-                        if attempt < max_retries:
-                            continue
-                        raise Exception(f"Authentication failed after {max_retries} retries")
+                        elif resp.status == 401:
+                            # Gateway is up; auth failed, retry with fresh token (one refresh for all waiters)
+                            self.circuit_breaker.record_success()
+                            if self.config.auth_type == "oauth2":
+                                await self._refresh_token(
+                                    stale_token=auth_headers.get('Authorization', '')[len('Bearer '):]
+                                )
+                            if attempt < max_retries:
+                                continue
+                            raise Exception(f"Authentication failed after {max_retries} retries")
                         
-                    elif resp.status >= 500:
-                        # Server error, retry with backoff
-                        if attempt < max_retries:
-                            await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                            continue
-                        raise Exception(f"Server error {resp.status}: {await resp.text()}")
+                        elif resp.status == 429 or resp.status >= 500:
+                            # Throttled or server error, retry with backoff
+                            overloaded = True
+                            self.circuit_breaker.record_failure()
+                            if attempt >= max_retries:
+                                raise Exception(f"Server error {resp.status}: {await resp.text()}")
+                            retry_after = resp.headers.get('Retry-After')
+                        
+                        else:
+                            # Client error, don't retry
+                            self.circuit_breaker.record_success()
+                            raise Exception(f"Request failed {resp.status}: {await resp.text()}")
                         
-                    else:
-                        # Client error, don't retry
-                        raise Exception(f"Request failed {resp.status}: {await resp.text()}")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    overloaded = True
+                    self.circuit_breaker.record_failure()
+                    if attempt >= max_retries:
+                        raise Exception(f"Connection error: {str(e)}")
                         
-            except aiohttp.ClientError as e:
-                if attempt < max_retries:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                raise Exception(f"Connection error: {str(e)}")
+                finally:
+                    if probe and self.circuit_breaker.state == CircuitBreaker.HALF_OPEN:
+                        self.circuit_breaker.release_probe()
+                    if slot_held:
+                        self.limiter.release(time.monotonic() - started, overloaded)
+                    
+                await asyncio.sleep(self._backoff_delay(attempt, retry_after))
                 
-        raise Exception(f"Request failed after {max_retries} retries")
+            raise Exception(f"Request failed after {max_retries} retries")
+            
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Retry-After when the gateway sends one, else full-jitter exponential backoff"""
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+                except (TypeError, ValueError):
+                    pass
+        cap = min(self.config.retry_max_delay, self.config.retry_base_delay * 2 ** attempt)
+        return random.uniform(0, cap)
+        
+    def gateway_stats(self) -> Dict[str, Any]:
+        """Current concurrency window and circuit state"""
+        return {
+            'concurrency_limit': int(self.limiter.limit),
+            'inflight': self.limiter.inflight,
+            'circuit_state': self.circuit_breaker.state,
+            'consecutive_failures': self.circuit_breaker.failures
+        }
         
     async def create_pup_optimization(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Create new PUP optimization record"""
@@ -285,31 +1546,801 @@ class SAPConnector:
             else:
                 raise Exception(f"Update failed {resp.status}: {await resp.text()}")
 
+    async def batch_write_pup_optimizations(
+        self,
+        creates: List[Dict[str, Any]] = None,
+        updates: List[Tuple[str, Dict[str, Any]]] = None,
+        batch_size: Optional[int] = None,
+        atomic: bool = False
+    ) -> List[BatchItemResult]:
+        """
+        Create and update PUP optimization records through OData `$batch`
+        
+        Operations are packed into multipart `$batch` requests of at most
+        `batch_size` operations / `config.batch_max_bytes` bytes, sent
+        concurrently under `config.max_concurrency`. Requests rejected as too
+        large (413) are split in half and resent.
+        
+        Args:
+            creates: Records to create
+            updates: (key, data) pairs to PATCH
+            batch_size: Operations per $batch request (defaults to config.batch_size)
+            atomic: Put all operations of a request into one changeset, so they
+                succeed or fail together. By default every operation gets its
+                own changeset and fails independently.
+                
+        Returns:
+            One BatchItemResult per operation, creates first, in input order
+        """
+        batch_size = batch_size or self.config.batch_size
+        
+        operations = [
+            ('create', index, None, data) for index, data in enumerate(creates or [])
+        ] + [
+            ('update', index, key, data) for index, (key, data) in enumerate(updates or [])
+        ]
+        if not operations:
+            return []
+            
+        # Split by operation count and payload size
+        chunks = []
+        chunk, chunk_bytes = [], 0
+        for op in operations:
+            op_bytes = len(json.dumps(op[3]))
+            if chunk and (len(chunk) >= batch_size or chunk_bytes + op_bytes > self.config.batch_max_bytes):
+                chunks.append(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append(op)
+            chunk_bytes += op_bytes
+        chunks.append(chunk)
+        
+        semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        
+        async def send(chunk):
+            async with semaphore:
+                return await self._send_batch_chunk(chunk, atomic)
+                
+        chunk_results = await asyncio.gather(*(send(chunk) for chunk in chunks))
+        return [result for results in chunk_results for result in results]
+        
+    async def _send_batch_chunk(
+        self,
+        operations: List[Tuple[str, int, Optional[str], Dict[str, Any]]],
+        atomic: bool
+    ) -> List[BatchItemResult]:
+        """Send one $batch request, splitting it if the gateway rejects its size"""
+        changesets = [operations] if atomic else [[op] for op in operations]
+        batch_boundary = f"batch_{uuid.uuid4().hex}"
+        body = self._build_batch_body(changesets, batch_boundary)
+        
+        try:
+            with self._track_request():
+                status, content_type, text = await self._post_batch(body, batch_boundary)
+        except Exception as e:
+            return [self._batch_failure(op, 0, str(e)) for op in operations]
+            
+        if status == 413 and len(operations) > 1:
+            middle = len(operations) // 2
+            first = await self._send_batch_chunk(operations[:middle], atomic)
+            second = await self._send_batch_chunk(operations[middle:], atomic)
+            return first + second
+            
+        if status not in [200, 202]:
+            return [self._batch_failure(op, status, text) for op in operations]
+            
+        boundary = self._multipart_boundary(content_type)
+        parts = self._split_multipart(text, boundary) if boundary else []
+        
+        results = []
+        for position, changeset in enumerate(changesets):
+            if position >= len(parts):
+                results.extend(
+                    self._batch_failure(op, 0, "Missing response in $batch") for op in changeset
+                )
+                continue
+                
+            headers, part_body = parts[position]
+            nested_boundary = self._multipart_boundary(headers.get('content-type', ''))
+            if nested_boundary:
+                responses = [
+                    self._parse_http_response(inner_body)
+                    for _, inner_body in self._split_multipart(part_body, nested_boundary)
+                ]
+            else:
+                # A failed changeset is answered with a single error response
+                responses = [self._parse_http_response(part_body)] * len(changeset)
+                
+            for op, (op_status, op_body) in zip(changeset, responses):
+                if 200 <= op_status < 300:
+                    results.append(BatchItemResult(
+                        operation=op[0],
+                        index=op[1],
+                        key=op[2],
+                        status=op_status,
+                        success=True,
+                        data=self._parse_json_body(op_body)
+                    ))
+                else:
+                    results.append(self._batch_failure(op, op_status, self._odata_error_message(op_body)))
+                    
+        return results
+        
+    def _build_batch_body(
+        self,
+        changesets: List[List[Tuple[str, int, Optional[str], Dict[str, Any]]]],
+        batch_boundary: str
+    ) -> str:
+        """Serialize changesets into an OData multipart/mixed $batch body"""
+        lines = []
+        content_id = 0
+        
+        for changeset in changesets:
+            changeset_boundary = f"changeset_{uuid.uuid4().hex}"
+            lines += [
+                f"--{batch_boundary}",
+                f"Content-Type: multipart/mixed; boundary={changeset_boundary}",
+                ""
+            ]
+            
+            for operation, _, key, data in changeset:
+                content_id += 1
+                payload = json.dumps(data)
+                if operation == 'create':
+                    request_line = f"POST {self.config.entity_set} HTTP/1.1"
+                else:
+                    # PATCH for partial updates
+                    request_line = f"PATCH {self.config.entity_set}('{key}') HTTP/1.1"
+                    
+                lines += [
+                    f"--{changeset_boundary}",
+                    "Content-Type: application/http",
+                    "Content-Transfer-Encoding: binary",
+                    f"Content-ID: {content_id}",
+                    "",
+                    request_line,
+                    "Content-Type: application/json",
+                    "Accept: application/json",
+                    f"Content-Length: {len(payload.encode())}",
+                    "",
+                    payload
+                ]
+                
+            lines += [f"--{changeset_boundary}--", ""]
+            
+        lines += [f"--{batch_boundary}--", ""]
+        return "\r\n".join(lines)
+        
+    async def _post_batch(self, body: str, boundary: str) -> Tuple[int, str, str]:
+        """POST a $batch body, fetching or refreshing the CSRF token as needed"""
+        url = f"{self.config.base_url}{self.config.odata_service}$batch"
+        
+        for attempt in range(2):
+            token = self.csrf_token or await self._fetch_csrf_token()
+            auth_headers = await self._get_auth_headers()
+            headers = {
+                **auth_headers,
+                'X-CSRF-Token': token,
+                'Content-Type': f'multipart/mixed; boundary={boundary}',
+                'Accept': 'multipart/mixed'
+            }
+            
+            async with self.session.post(url, data=body.encode(), headers=headers) as resp:
+                if resp.status == 403 and resp.headers.get('X-CSRF-Token', '').lower() == 'required':
+                    # Token expired with the server session, fetch a new one once
+                    if self.csrf_token == token:
+                        self.csrf_token = None
+                    if attempt == 0:
+                        continue
+                return resp.status, resp.headers.get('Content-Type', ''), await resp.text()
+        
+    async def _fetch_csrf_token(self) -> str:
+        """Fetch a CSRF token once and share it across concurrent writers"""
+        async with self._csrf_lock:
+            if self.csrf_token:
+                return self.csrf_token
+                
+            url = f"{self.config.base_url}{self.config.odata_service}"
+            auth_headers = await self._get_auth_headers()
+            headers = {**auth_headers, 'X-CSRF-Token': 'Fetch'}
+            
+            async with self.session.get(url, headers=headers) as resp:
+                token = resp.headers.get('X-CSRF-Token')
+                if resp.status != 200 or not token:
+                    raise Exception(f"CSRF token fetch failed {resp.status}")
+                self.csrf_token = token
+                return token
+                
+    @staticmethod
+    def _batch_failure(
+        op: Tuple[str, int, Optional[str], Dict[str, Any]],
+        status: int,
+        error: str
+    ) -> BatchItemResult:
+        return BatchItemResult(
+            operation=op[0], index=op[1], key=op[2], status=status, success=False, error=error
+        )
+        
+    @staticmethod
+    def _multipart_boundary(content_type: str) -> Optional[str]:
+        if not content_type.lower().startswith('multipart/'):
+            return None
+        match = re.search(r'boundary="?([^";]+)"?', content_type)
+        return match.group(1) if match else None
+        
+    @staticmethod
+    def _split_multipart(body: str, boundary: str) -> List[Tuple[Dict[str, str], str]]:
+        """Split a multipart body into (lower-cased headers, body) parts"""
+        parts = []
+        for chunk in body.replace('\r\n', '\n').split(f"--{boundary}")[1:]:
+            if chunk.startswith('--'):
+                break
+            head, _, part_body = chunk.strip('\n').partition('\n\n')
+            headers = {}
+            for line in head.split('\n'):
+                name, sep, value = line.partition(':')
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            parts.append((headers, part_body.strip('\n')))
+        return parts
+        
+    @staticmethod
+    def _parse_http_response(text: str) -> Tuple[int, str]:
+        """Parse an embedded application/http response into (status, body)"""
+        # Status line and headers end at the first blank line (there may be no headers)
+        head, _, body = text.strip('\n').partition('\n\n')
+        status_line = head.partition('\n')[0]
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            status = 0
+        return status, body.strip()
+        
+    @staticmethod
+    def _parse_json_body(body: str) -> Dict[str, Any]:
+        if not body:
+            return {}
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {}
+            
+    @staticmethod
+    def _odata_error_message(body: str) -> str:
+        try:
+            error = json.loads(body)['error']
+            message = error.get('message')
+            return message.get('value') if isinstance(message, dict) else str(message)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return body
+
+class PUPLocalStore:
+    """
+    Local Parquet copy of the PUP entity set, kept current by delta sync
+    
+    Layout: <root>/period=<Period>/company_code=<CompanyCode>/data.parquet
+    plus <root>/_sync_state.json holding a delta link and change watermark
+    per sync scope. Rows are merged on SAPConfig.key_fields.
+    """
+    
+    STATE_FILE = "_sync_state.json"
+    
+    def __init__(self, root: str, config: SAPConfig, flush_rows: int = 200_000):
+        if not HAS_ARROW:
+            raise ImportError("pyarrow required for the local PUP store")
+        self.root = root
+        self.config = config
+        self.flush_rows = flush_rows  # Buffered changed rows before merging to disk
+        os.makedirs(root, exist_ok=True)
+        
+    async def sync(
+        self,
+        company_codes: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        sap: Optional[SAPConnector] = None
+    ) -> Dict[str, Any]:
+        """
+        Pull changed rows for the scope and merge them into the store
+        
+        Uses the stored OData delta link when there is one, otherwise a
+        `watermark_field ge <last seen>` filter, otherwise a full pull.
+        
+        Returns:
+            Sync statistics (mode, changed_rows, removed_rows, partitions)
+        """
+        if sap is None:
+            async with SAPConnector(self.config) as sap:
+                return await self.sync(company_codes, period_from, period_to, sap)
+                
+        scope = json.dumps([sorted(company_codes or []), period_from, period_to])
+        state = self._load_state()
+        scope_state = state.get(scope, {})
+        
+        url = sap._entity_set_url()
+        params = sap._build_pup_params(company_codes, None, None, period_from, period_to)
+        mode = 'full'
+        
+        if scope_state.get('watermark'):
+            mode = 'watermark'
+            clause = f"{self.config.watermark_field} ge datetime'{scope_state['watermark']}'"
+            params['$filter'] = f"{params['$filter']} and {clause}" if '$filter' in params else clause
+            
+        stats = {'changed_rows': 0, 'removed_rows': 0, 'partitions': set()}
+        watermark = scope_state.get('watermark')
+        delta_link = None
+        
+        if scope_state.get('delta_link'):
+            try:
+                watermark, delta_link = await self._pull(
+                    sap, scope_state['delta_link'], None, watermark, stats
+                )
+                mode = 'delta'
+            except Exception:
+                # Expired or unsupported delta token: fall back to the watermark
+                delta_link = None
+                
+        if mode != 'delta':
+            watermark, delta_link = await self._pull(sap, url, params, watermark, stats)
+            
+        state[scope] = {
+            'delta_link': delta_link,
+            'watermark': watermark,
+            'synced_at': datetime.now(timezone.utc).isoformat()
+        }
+        self._save_state(state)
+        
+        return {
+            'mode': mode,
+            'changed_rows': stats['changed_rows'],
+            'removed_rows': stats['removed_rows'],
+            'partitions': len(stats['partitions'])
+        }
+        
+    async def _pull(
+        self,
+        sap: SAPConnector,
+        url: str,
+        params: Optional[Dict[str, str]],
+        watermark: Optional[str],
+        stats: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Follow a change feed to its end, merging as buffers fill"""
+        buffered: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        buffered_rows = 0
+        # Removed keys whose partition the tombstone does not tell
+        unplaced: set = set()
+        delta_link = None
+        latest = self._parse_timestamp(watermark) if watermark else None
+        
+        while url:
+            data = await sap._get_json_with_retry(url, params)
+            
+            for record in sap._extract_results(data):
+                if self._is_removed(record):
+                    # V4 tombstones usually carry only @id: take the key from it
+                    record = {
+                        **self._parse_entity_key(record),
+                        **{k: v for k, v in record.items() if v is not None}
+                    }
+                    if record.get('Period') is None or record.get('CompanyCode') is None:
+                        unplaced.add(self._key_of(record))
+                        continue
+                elif unplaced:
+                    # Re-added after its removal
+                    unplaced.discard(self._key_of(record))
+                        
+                partition = (str(record.get('Period')), str(record.get('CompanyCode')))
+                buffered.setdefault(partition, []).append(record)
+                buffered_rows += 1
+                
+                changed_at = self._parse_timestamp(record.get(self.config.watermark_field))
+                if changed_at and (latest is None or changed_at > latest):
+                    latest = changed_at
+                    
+            if buffered_rows >= self.flush_rows:
+                self._merge(buffered, stats)
+                self._remove_anywhere(unplaced, stats)
+                buffered, buffered_rows, unplaced = {}, 0, set()
+                
+            next_link = sap._extract_next_link(data)
+            delta_link = sap._extract_delta_link(data) or delta_link
+            url, params = (urljoin(url, next_link), None) if next_link else (None, None)
+            
+        self._merge(buffered, stats)
+        self._remove_anywhere(unplaced, stats)
+        
+        new_watermark = latest.strftime('%Y-%m-%dT%H:%M:%S') if latest else watermark
+        return new_watermark, delta_link
+        
+    def _merge(
+        self,
+        buffered: Dict[Tuple[str, str], List[Dict[str, Any]]],
+        stats: Dict[str, Any]
+    ):
+        """Upsert buffered rows into their partitions, dropping removed keys"""
+        for (period, company_code), records in buffered.items():
+            # Apply events in feed order: a key re-added after its removal stays
+            removed = set()
+            rows = []
+            for r in records:
+                if self._is_removed(r):
+                    removed.add(self._key_of(r))
+                else:
+                    removed.discard(self._key_of(r))
+                    rows.append({k: v for k, v in r.items() if not k.startswith(('__', '@'))})
+            
+            path = self._partition_path(period, company_code)
+            existing = pq.read_table(path) if os.path.exists(path) else None
+            
+            if existing is not None:
+                if rows:
+                    # Columns first seen as all-null (or absent) get their type from later deltas
+                    table = pa.concat_tables(
+                        [existing, pa.Table.from_pylist(rows)], promote_options='permissive'
+                    )
+                else:
+                    table = existing
+            elif rows:
+                table = pa.Table.from_pylist(rows)
+            else:
+                stats['removed_rows'] += len(removed)
+                continue
+                
+            # Keep the last version of every key, minus removed keys
+            latest = {}
+            for index, key in enumerate(self._table_keys(table)):
+                latest[key] = index
+            keep = [index for key, index in latest.items() if key not in removed]
+            self._write_partition(path, table.take(pa.array(sorted(keep), type=pa.int64())))
+            
+            stats['changed_rows'] += len(rows)
+            stats['removed_rows'] += len(removed)
+            stats['partitions'].add((period, company_code))
+            
+    def _remove_anywhere(self, removed: set, stats: Dict[str, Any]):
+        """Drop removed keys from whichever partitions hold them"""
+        if not removed:
+            return
+        for period, company_code in self._partitions():
+            path = self._partition_path(period, company_code)
+            table = pq.read_table(path)
+            keep = [index for index, key in enumerate(self._table_keys(table)) if key not in removed]
+            if len(keep) == table.num_rows:
+                continue
+            self._write_partition(path, table.take(pa.array(keep, type=pa.int64())))
+            stats['partitions'].add((period, company_code))
+        stats['removed_rows'] += len(removed)
+        
+    def _partitions(self) -> List[Tuple[str, str]]:
+        """(Period, CompanyCode) of every stored partition"""
+        partitions = []
+        for period_dir in sorted(os.listdir(self.root)):
+            if not period_dir.startswith('period='):
+                continue
+            for company_dir in sorted(os.listdir(os.path.join(self.root, period_dir))):
+                partitions.append((
+                    unquote(period_dir[len('period='):]),
+                    unquote(company_dir[len('company_code='):])
+                ))
+        return partitions
+        
+    def _write_partition(self, path: str, table: "pa.Table"):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        
+    def _key_of(self, record: Dict[str, Any]) -> Tuple:
+        # Keys parsed from @id are strings, so compare every key as a string
+        return tuple(str(record.get(f)) for f in self.config.key_fields)
+        
+    def _table_keys(self, table: "pa.Table") -> Iterable[Tuple]:
+        columns = (table.column(f).to_pylist() for f in self.config.key_fields)
+        return (tuple(str(value) for value in key) for key in zip(*columns))
+        
+    @staticmethod
+    def _is_removed(record: Dict[str, Any]) -> bool:
+        return '@removed' in record or '@odata.removed' in record
+        
+    def _parse_entity_key(self, record: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Key properties from an entity id such as
+        `PUPOptimizationSet(CompanyCode='1000',Period='2024-01',...)`,
+        or `PUPOptimizationSet('M1')` for a single key field
+        """
+        entity_id = record.get('@id') or record.get('@odata.id') or ''
+        match = re.search(r'\(([^()]*)\)\s*$', unquote(str(entity_id)))
+        if not match:
+            return {}
+        pairs = re.findall(r"(?:(\w+)=)?('(?:[^']|'')*'|[^,]+)", match.group(1))
+        key = {}
+        for name, value in pairs:
+            if not name:
+                if len(pairs) != 1 or len(self.config.key_fields) != 1:
+                    return {}
+                name = self.config.key_fields[0]
+            if value.startswith("'"):
+                value = value[1:-1].replace("''", "'")
+            key[name] = value
+        return key
+            
+    def read_table(
+        self,
+        company_codes: List[str] = None,
+        period_from: str = None,
+        period_to: str = None,
+        columns: Optional[List[str]] = None
+    ) -> "pa.Table":
+        """Read matching partitions as one Arrow table"""
+        tables = []
+        for period, company_code in self._partitions():
+            if (period_from and period < period_from) or (period_to and period > period_to):
+                continue
+            if company_codes and company_code not in company_codes:
+                continue
+            tables.append(pq.read_table(
+                self._partition_path(period, company_code), columns=columns
+            ))
+                
+        if not tables:
+            return pa.table({})
+        return pa.concat_tables(tables, promote_options='default')
+        
+    def read_records(
+        self,
+        company_codes: List[str] = None,
+        period_from: str = None,
+        period_to: str = None
+    ) -> List[Dict[str, Any]]:
+        """Read matching rows as OData-shaped records"""
+        return self.read_table(company_codes, period_from, period_to).to_pylist()
+        
+    def _partition_path(self, period: str, company_code: str) -> str:
+        return os.path.join(
+            self.root,
+            f"period={quote(period, safe='')}",
+            f"company_code={quote(company_code, safe='')}",
+            "data.parquet"
+        )
+        
+    @staticmethod
+    def _parse_timestamp(value: Any) -> Optional[datetime]:
+        """Parse OData V2 `/Date(ms)/` or ISO timestamps as naive UTC"""
+        if not value:
+            return None
+        match = re.match(r'/Date\((-?\d+)', str(value))
+        if match:
+            return datetime.fromtimestamp(int(match.group(1)) / 1000, timezone.utc).replace(tzinfo=None)
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+        
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.root, self.STATE_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+            
+    def _save_state(self, state: Dict[str, Any]):
+        path = os.path.join(self.root, self.STATE_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+class SAPConnectorRegistry:
+    """
+    Process-wide pool of warm SAPConnector instances
+    
+    One connector per event loop, SAP system, credentials and response
+    cache, created on first use and shared by every tenant that targets it,
+    so sessions, TCP/TLS connections and OAuth2 tokens survive across calls.
+    
+    Pooled connectors live until shutdown(). Code that runs each job in its
+    own short-lived loop (plain asyncio.run) must await shutdown() before the
+    loop ends, or use per-call connectors (SAPDataProcessor(registry=None));
+    otherwise every run leaves an unclosed session and token refresher behind.
+    """
+    
+    def __init__(self):
+        self._connectors: Dict[Tuple, SAPConnector] = {}
+        self._locks: Dict[Tuple, asyncio.Lock] = {}
+        
+    @staticmethod
+    def _key(config: SAPConfig, cache: Optional[ResponseCache]) -> Tuple:
+        return (
+            id(asyncio.get_running_loop()),
+            config.base_url,
+            config.odata_service,
+            config.entity_set,
+            config.auth_type,
+            config.username,
+            config.client_id,
+            # Never hand a connector authenticated with one secret to a config holding another
+            hashlib.sha256(f"{config.password}\0{config.client_secret}".encode()).hexdigest(),
+            id(cache)
+        )
+        
+    async def get(
+        self,
+        environment: SAPEnvironment = SAPEnvironment.PROD,
+        config: Optional[SAPConfig] = None,
+        cache: Optional[ResponseCache] = None
+    ) -> SAPConnector:
+        """Return a connected connector, creating or replacing it lazily"""
+        config = config or SAPConfig.from_env(environment)
+        self._purge_closed_loops()
+        key = self._key(config, cache)
+        
+        connector = self._connectors.get(key)
+        if connector is not None and connector.is_healthy():
+            return connector
+            
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            connector = self._connectors.get(key)
+            if connector is not None and connector.is_healthy():
+                return connector
+            if connector is not None:
+                await connector.disconnect()
+                
+            connector = SAPConnector(config, cache=cache)
+            await connector.connect()
+            self._connectors[key] = connector
+            return connector
+            
+    async def health_check(self, probe: bool = False) -> Dict[str, bool]:
+        """Health of every pooled connector, optionally probing the gateway"""
+        results = {}
+        for key, connector in list(self._connectors.items()):
+            healthy = connector.is_healthy()
+            if healthy and probe and not await connector.ping():
+                healthy = False
+                await connector.disconnect()
+            results[f"{connector.config.base_url}{connector.config.odata_service}"] = healthy
+            if not healthy:
+                # Replaced on next get()
+                self._connectors.pop(key, None)
+        return results
+        
+    async def shutdown(self, drain_timeout: float = 10.0):
+        """Drain in-flight requests and close every pooled connector"""
+        connectors = list(self._connectors.values())
+        self._connectors.clear()
+        self._locks.clear()
+        await asyncio.gather(
+            *(connector.disconnect(drain_timeout) for connector in connectors if connector.is_healthy()),
+            return_exceptions=True
+        )
+        
+    def _purge_closed_loops(self):
+        """Forget connectors whose event loop has gone away (e.g. after asyncio.run)"""
+        for key, connector in list(self._connectors.items()):
+            if connector._loop is None or connector._loop.is_closed():
+                self._connectors.pop(key, None)
+                self._locks.pop(key, None)
+
+# Default process-wide registry
+connector_registry = SAPConnectorRegistry()
+
 # Usage examples and utilities
 class SAPDataProcessor:
-    """High-level processor for SAP data operations"""
+    """
+    High-level processor for SAP data operations
     
-    def __init__(self, environment: SAPEnvironment = SAPEnvironment.PROD):
+    Uses the process-wide connector_registry by default, which suits
+    long-lived event loops. Scripts that call asyncio.run per job should
+    pass registry=None, or await connector_registry.shutdown() before the
+    loop ends (see SAPConnectorRegistry).
+    """
+    
+    def __init__(
+        self,
+        environment: SAPEnvironment = SAPEnvironment.PROD,
+        cache: Optional[ResponseCache] = None,
+        registry: Optional[SAPConnectorRegistry] = connector_registry
+    ):
+        self.environment = environment
         self.config = SAPConfig.from_env(environment)
+        # Shared across calls so repeated refreshes are served locally
+        self.cache = cache
+        # Warm connectors; None opens a fresh connector per call
+        self.registry = registry
+        
+    @contextlib.asynccontextmanager
+    async def _connector(self):
+        """Pooled connector from the registry, or a per-call one without it"""
+        if self.registry is None:
+            async with SAPConnector(self.config, cache=self.cache) as sap:
+                yield sap
+        else:
+            yield await self.registry.get(self.environment, self.config, cache=self.cache)
         
     async def get_monthly_pup_data(
         self, 
         tenant_company_codes: List[str],
-        period: str = None
+        period: str = None,
+        parallel: bool = False,
+        select: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
-        """Get monthly PUP data for specific tenant"""
+        """Get monthly PUP data for specific tenant
+        
+        With `parallel=True` the full period is pulled as concurrent shards
+        instead of a single request capped by `limit`. Pass
+        `select=PUP_QUANTUM_FIELDS` to transfer only the columns that
+        process_quantum_optimization reads.
+        """
         
         if not period:
             from datetime import datetime
             period = datetime.now().strftime("%Y-%m")
             
-        async with SAPConnector(self.config) as sap:
+        async with self._connector() as sap:
+            if parallel:
+                return await sap.query_pup_data_parallel(
+                    company_codes=tenant_company_codes,
+                    period_from=period,
+                    period_to=period,
+                    select=select
+                )
             return await sap.query_pup_data(
                 company_codes=tenant_company_codes,
                 period_from=period,
-                period_to=period
+                period_to=period,
+                select=select
             )
             
+    async def get_training_data(
+        self,
+        store: PUPLocalStore,
+        tenant_company_codes: List[str] = None,
+        period_from: str = None,
+        period_to: str = None
+    ) -> List[Dict[str, Any]]:
+        """Read PUP history from the local store, processed for the ML service"""
+        return await self.process_quantum_optimization(
+            store.read_records(tenant_company_codes, period_from, period_to)
+        )
+        
+    async def get_monthly_pup_columns(
+        self,
+        tenant_company_codes: List[str],
+        period: str = None,
+        page_size: int = 5000
+    ) -> Dict[str, "np.ndarray"]:
+        """Get monthly PUP data as typed columns, converted page by page
+        
+        The result can be passed directly to SAPienceMLService.prepare_features.
+        """
+        if not period:
+            period = datetime.now().strftime("%Y-%m")
+            
+        builder = PUPColumnBuilder()
+        async with self._connector() as sap:
+            async for page in sap.iter_pup_data(
+                company_codes=tenant_company_codes,
+                period_from=period,
+                period_to=period,
+                page_size=page_size,
+                select=list(PUP_QUANTUM_FIELDS)
+            ):
+                builder.append_page(page)
+        return builder.finish()
+        
+    def process_quantum_optimization_columnar(
+        self,
+        pages: Iterable[List[Dict[str, Any]]]
+    ) -> Dict[str, "np.ndarray"]:
+        """Columnar variant of process_quantum_optimization over OData pages"""
+        builder = PUPColumnBuilder()
+        for page in pages:
+            builder.append_page(page)
+        return builder.finish()
+        
     async def process_quantum_optimization(
         self,
         raw_data: List[Dict[str, Any]]
@@ -340,6 +2371,7 @@ if __name__ == "__main__":
     parser.add_argument('--env', choices=['dev', 'test', 'prod'], default='prod')
     parser.add_argument('--company-codes', nargs='+', default=['1000'])
     parser.add_argument('--period', default=None)
+    parser.add_argument('--parallel', action='store_true', help='Sharded parallel extraction')
     
     args = parser.parse_args()
     
@@ -350,7 +2382,8 @@ if __name__ == "__main__":
         print(f"Testing SAP connection ({env.value})...")
         data = await processor.get_monthly_pup_data(
             tenant_company_codes=args.company_codes,
-            period=args.period
+            period=args.period,
+            parallel=args.parallel
         )
         
         print(f"Retrieved {len(data)} records")
@@ -358,4 +2391,6 @@ if __name__ == "__main__":
             print("Sample record:")
             print(json.dumps(data[0], indent=2))
             
+        await connector_registry.shutdown()
+            
     asyncio.run(main())
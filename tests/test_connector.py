@@ -0,0 +1,323 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "sap"))
+
+from connector import CircuitBreaker, SAPConfig, SAPConnector  # noqa: E402
+
+
+class _Response:
+    def __init__(self, status=200, body=b""):
+        self.status = status
+        self.headers = {}
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def text(self):
+        return self._body.decode()
+
+
+class _Session:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def _open_connector(responses):
+    connector = SAPConnector(SAPConfig(
+        username="user", password="secret", max_retries=0,
+        circuit_failure_threshold=1, circuit_recovery_timeout=0.0
+    ))
+    connector.session = _Session(responses)
+    connector.circuit_breaker.record_failure()
+    assert connector.circuit_breaker.state == CircuitBreaker.OPEN
+    return connector
+
+
+def test_half_open_probe_released_when_reader_raises():
+    async def run():
+        connector = _open_connector([_Response(), _Response(body=b"ok")])
+
+        async def bad_reader(resp):
+            raise ValueError("bad payload")
+
+        with pytest.raises(ValueError):
+            await connector._get_with_retry("http://sap/x", None, bad_reader)
+        assert connector.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+        text = await connector._get_with_retry("http://sap/x", None, connector._read_text)
+        assert text == "ok"
+        assert connector.circuit_breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(run())
+
+
+def test_half_open_probe_released_when_cancelled():
+    async def run():
+        connector = _open_connector([_Response(), _Response(body=b"ok")])
+        started = asyncio.Event()
+
+        async def slow_reader(resp):
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.ensure_future(connector._get_with_retry("http://sap/x", None, slow_reader))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        text = await connector._get_with_retry("http://sap/x", None, connector._read_text)
+        assert text == "ok"
+
+    asyncio.run(run())
+
+
+class _Content:
+    def __init__(self, chunks, error):
+        self.chunks = chunks
+        self.error = error
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+        raise self.error
+
+
+def test_stream_timeout_after_records_is_not_retried():
+    async def run():
+        page = _Response()
+        page.content = _Content([b'{"value": [{"a": 1}, {"a": 2}, '], asyncio.TimeoutError())
+        connector = SAPConnector(SAPConfig(username="user", password="secret", max_retries=2))
+        connector.session = _Session([page])
+
+        seen = []
+        with pytest.raises(Exception, match="Stream interrupted"):
+            async for record in connector._stream_records("http://sap/x", None, {}):
+                seen.append(record)
+        assert seen == [{"a": 1}, {"a": 2}]
+        assert connector.session.calls == 1
+        assert connector.limiter.inflight == 0
+
+    asyncio.run(run())
+
+
+class _ChangeFeed:
+    def __init__(self, pages):
+        self.pages = list(pages)
+
+    async def _get_json_with_retry(self, url, params):
+        return self.pages.pop(0)
+
+    _extract_results = staticmethod(SAPConnector._extract_results)
+    _extract_next_link = staticmethod(SAPConnector._extract_next_link)
+    _extract_delta_link = staticmethod(SAPConnector._extract_delta_link)
+
+
+def test_local_store_applies_id_only_tombstones(tmp_path):
+    pytest.importorskip("pyarrow")
+    from connector import PUPLocalStore
+
+    def row(material, note):
+        return {"CompanyCode": "1000", "MaterialNumber": material, "Plant": "P1",
+                "Period": "2024-01", "Note": note}
+
+    store = PUPLocalStore(str(tmp_path), SAPConfig())
+    stats = {"changed_rows": 0, "removed_rows": 0, "partitions": set()}
+    feed = _ChangeFeed([
+        {"value": [row("M1", None), row("M2", None)]},
+        {"value": [
+            row("M3", "new"),
+            {"@removed": {"reason": "deleted"},
+             "@id": "PUPOptimizationSet(CompanyCode='1000',MaterialNumber='M1',Plant='P1',Period='2024-01')"}
+        ]}
+    ])
+
+    async def run():
+        await store._pull(feed, "http://sap/x", None, None, stats)
+        await store._pull(feed, "http://sap/x", None, None, stats)
+
+    asyncio.run(run())
+    assert stats["removed_rows"] == 1
+    assert sorted(r["MaterialNumber"] for r in store.read_records()) == ["M2", "M3"]
+
+
+def test_local_store_keeps_row_re_added_after_removal(tmp_path):
+    pytest.importorskip("pyarrow")
+    from connector import PUPLocalStore
+
+    def row(material, quantity):
+        return {"CompanyCode": "1000", "MaterialNumber": material, "Plant": "P1",
+                "Period": "2024-01", "Quantity": quantity}
+
+    store = PUPLocalStore(str(tmp_path), SAPConfig())
+    stats = {"changed_rows": 0, "removed_rows": 0, "partitions": set()}
+    tombstone = {"@removed": {"reason": "deleted"},
+                 "@id": "PUPOptimizationSet(CompanyCode='1000',MaterialNumber='A',Plant='P1',Period='2024-01')"}
+    feed = _ChangeFeed([
+        {"value": [row("A", 1), row("B", 2)]},
+        {"value": [tombstone, row("A", 9), row("B", 3), dict(tombstone, **{
+            "@id": "PUPOptimizationSet(CompanyCode='1000',MaterialNumber='B',Plant='P1',Period='2024-01')"
+        })]}
+    ])
+
+    async def run():
+        await store._pull(feed, "http://sap/x", None, None, stats)
+        await store._pull(feed, "http://sap/x", None, None, stats)
+
+    asyncio.run(run())
+    assert [(r["MaterialNumber"], r["Quantity"]) for r in store.read_records()] == [("A", 9)]
+
+
+def _filter_lengths(plan):
+    from urllib.parse import quote
+    return [len(quote(params["$filter"], safe="")) for params in plan]
+
+
+def test_filter_planner_packs_chunks_by_measured_width():
+    connector = SAPConnector(SAPConfig())
+    materials = [f"MAT{i:06d}" for i in range(3000)]
+    plan = connector._plan_pup_queries(materials=materials, period_from="2024-01", period_to="2024-12")
+
+    lengths = _filter_lengths(plan)
+    assert max(lengths) <= connector.config.max_filter_length
+    # Every chunk but the last is filled close to the limit
+    assert sorted(lengths)[1] > connector.config.max_filter_length * 0.9
+    assert sum(p["$filter"].count("MaterialNumber eq") for p in plan) == len(materials)
+
+
+def test_filter_planner_splits_another_dimension_when_widest_cannot_split():
+    connector = SAPConnector(SAPConfig(max_filter_length=300))
+    company_codes = [f"{i:04d}" for i in range(20)]
+    plan = connector._plan_pup_queries(company_codes=company_codes, materials=["X" * 150])
+
+    assert max(_filter_lengths(plan)) <= 300
+    assert sum(p["$filter"].count("CompanyCode eq") for p in plan) == len(company_codes)
+
+    connector.config.max_filter_length = 100
+    with pytest.raises(ValueError):
+        connector._plan_pup_queries(materials=["X" * 150])
+
+
+def test_batch_body_has_one_changeset_per_operation():
+    connector = SAPConnector(SAPConfig())
+    changesets = [
+        [("create", 0, None, {"MaterialNumber": "M1"})],
+        [("update", 0, "K1", {"PUPValue": 12.5})]
+    ]
+    body = connector._build_batch_body(changesets, "batch_x")
+
+    parts = connector._split_multipart(body, "batch_x")
+    assert len(parts) == 2
+    requests = []
+    for headers, part_body in parts:
+        boundary = connector._multipart_boundary(headers["content-type"])
+        (inner_headers, inner_body), = connector._split_multipart(part_body, boundary)
+        assert inner_headers["content-type"] == "application/http"
+        requests.append(inner_body)
+
+    assert requests[0].startswith("POST PUPOptimizationSet HTTP/1.1")
+    assert requests[0].endswith('{"MaterialNumber": "M1"}')
+    assert "Content-Length: 24" in requests[0]
+    assert requests[1].startswith("PATCH PUPOptimizationSet('K1') HTTP/1.1")
+
+
+_BATCH_RESPONSE = "\r\n".join([
+    "--batchresp",
+    "Content-Type: multipart/mixed; boundary=cs1",
+    "",
+    "--cs1",
+    "Content-Type: application/http",
+    "Content-Transfer-Encoding: binary",
+    "",
+    "HTTP/1.1 201 Created",
+    "Content-Type: application/json",
+    "",
+    '{"d": {"MaterialNumber": "M1"}}',
+    "--cs1--",
+    "--batchresp",
+    "Content-Type: application/http",
+    "Content-Transfer-Encoding: binary",
+    "",
+    "HTTP/1.1 400 Bad Request",
+    "Content-Type: application/json",
+    "",
+    '{"error": {"code": "PUP/001", "message": {"lang": "en", "value": "Invalid plant"}}}',
+    "--batchresp",
+    "Content-Type: multipart/mixed; boundary=cs3",
+    "",
+    "--cs3",
+    "Content-Type: application/http",
+    "",
+    "HTTP/1.1 204 No Content",
+    "",
+    "",
+    "--cs3--",
+    "--batchresp--",
+    ""
+])
+
+
+def test_batch_response_reports_failed_changeset_per_operation():
+    connector = SAPConnector(SAPConfig())
+
+    async def post_batch(body, boundary):
+        return 202, "multipart/mixed; boundary=batchresp", _BATCH_RESPONSE
+
+    connector._post_batch = post_batch
+    operations = [
+        ("create", 0, None, {"MaterialNumber": "M1"}),
+        ("create", 1, None, {"MaterialNumber": "M2"}),
+        ("update", 0, "K1", {"PUPValue": 1.0})
+    ]
+    results = asyncio.run(connector._send_batch_chunk(operations, atomic=False))
+
+    assert [(r.operation, r.index, r.status, r.success) for r in results] == [
+        ("create", 0, 201, True),
+        ("create", 1, 400, False),
+        ("update", 0, 204, True)
+    ]
+    assert results[0].data == {"d": {"MaterialNumber": "M1"}}
+    assert results[1].error == "Invalid plant"
+    assert results[2].data == {}
+
+
+def test_parse_http_response_without_headers_or_status():
+    assert SAPConnector._parse_http_response("HTTP/1.1 200 OK\n\n{}") == (200, "{}")
+    assert SAPConnector._parse_http_response("garbage") == (0, "")
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_stream_decoder_handles_any_chunk_split(monkeypatch, use_orjson):
+    import json
+    import connector
+
+    if use_orjson:
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(connector, "HAS_ORJSON", use_orjson)
+    records = [
+        {"a": 1, "text": "brace } and [ bracket", "nested": {"list": [1, {"b": "\"q\\\\"}]}},
+        {"a": 2, "unicode": "é€", "empty": "", "looks_like_end": "}, {"},
+        {"a": 3}
+    ]
+    body = json.dumps({"d": {"results": records, "__next": "page2"}}, ensure_ascii=False).encode()
+
+    for split in range(1, len(body)):
+        decoder = connector.ODataStreamDecoder()
+        decoded = decoder.feed(body[:split]) + decoder.feed(body[split:]) + decoder.close()
+        assert decoded == records
+        assert decoder.links == {"next": "page2"}
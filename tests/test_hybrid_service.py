@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+for backend in ("lightgbm", "xgboost", "sklearn"):
+    pytest.importorskip(backend)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "ml"))
+
+from hybrid_service import (  # noqa: E402
+    ForecastHorizon, MLModelType, MLServiceAPI, PredictionCoalescer, SAPienceMLService
+)
+
+
+def _legacy_lag_rolling(df, lags, windows):
+    """The former one-groupby-per-feature computation"""
+    keys = ["material", "company_code", "plant"]
+    out = {}
+    for lag in lags:
+        out[f"pup_lag_{lag}"] = df.groupby(keys)["current_pup"].shift(lag)
+        out[f"quantity_lag_{lag}"] = df.groupby(keys)["quantity"].shift(lag)
+    for window in windows:
+        rolling = df.groupby(keys)["current_pup"].rolling(window=window, min_periods=1)
+        out[f"pup_rolling_mean_{window}"] = rolling.mean().droplevel(list(range(len(keys))))
+        rolling = df.groupby(keys)["current_pup"].rolling(window=window, min_periods=1)
+        out[f"pup_rolling_std_{window}"] = rolling.std().droplevel(list(range(len(keys))))
+    return pd.DataFrame(out, index=df.index)
+
+
+def _sap_data(series=6, periods=15, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.repeat(np.arange(series), periods)
+    months = np.tile(np.arange(periods), series)
+    return pd.DataFrame({
+        "material": (ids // 2).astype(str),
+        "company_code": "1000",
+        "plant": "P" + (ids % 2).astype(str),
+        "period": [f"{2023 + m // 12}-{m % 12 + 1:02d}" for m in months],
+        "current_pup": rng.uniform(50, 150, len(ids)),
+        "standard_price": 90.0,
+        "quantity": rng.integers(1, 1000, len(ids)).astype(float),
+    })
+
+
+def test_lag_rolling_features_match_legacy_groupby():
+    service = SAPienceMLService(MLModelType.CLASSICAL_ONLY)
+    df = _sap_data()
+    df.loc[[3, 4, 20, 40], "current_pup"] = np.nan
+    df.loc[[7, 50], "quantity"] = np.nan
+    # Rows without a group key belong to no series
+    df.loc[[30, 31, 32], "plant"] = None
+    df.loc[60, "material"] = np.nan
+
+    df["period_dt"] = pd.to_datetime(df["period"], format="%Y-%m")
+    df = df.sort_values(["material", "company_code", "plant", "period_dt"])
+
+    legacy = _legacy_lag_rolling(df, service.LAGS, service.ROLLING_WINDOWS)
+    vectorized = pd.DataFrame(service._lag_rolling_features(df), index=df.index)
+
+    assert list(vectorized.columns) == list(legacy.columns)
+    np.testing.assert_allclose(vectorized.to_numpy(), legacy.to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+@pytest.fixture(scope="module")
+def trained_service():
+    service = SAPienceMLService(MLModelType.HYBRID, cv_workers=1)
+    service.train(_sap_data().to_dict("records"))
+    return service
+
+
+def test_coalescer_results_match_standalone_predictions(trained_service):
+    data = _sap_data(seed=1)
+    # Overlapping groups across requests: partitions must keep their series apart
+    requests = [
+        data.iloc[:20],
+        data.iloc[10:40],
+        # Numeric strings are coerced per request, not merged into an object column
+        data.iloc[45:50].assign(current_pup=lambda d: d.current_pup.astype(str))
+    ]
+
+    async def run_batch(frame, horizon):
+        return trained_service.predict_pup_batch(frame, horizon)
+
+    async def run():
+        coalescer = PredictionCoalescer(run_batch, max_wait_ms=50)
+        results = await asyncio.gather(*(
+            coalescer.submit(frame.to_dict("records"), ForecastHorizon.MONTHLY) for frame in requests
+        ))
+        return coalescer, results
+
+    coalescer, results = asyncio.run(run())
+    assert coalescer.batches == 1 and coalescer.requests == 3
+
+    for frame, result in zip(requests, results):
+        frame = frame.astype({"current_pup": float}).reset_index(drop=True)
+        expected = trained_service.predict_pup_batch(frame, ForecastHorizon.MONTHLY)
+        np.testing.assert_array_equal(result.source_index, expected.source_index)
+        np.testing.assert_array_equal(result.period, expected.period)
+        np.testing.assert_allclose(result.predicted_pup, expected.predicted_pup)
+        np.testing.assert_allclose(result.classical_prediction, expected.classical_prediction)
+        np.testing.assert_allclose(result.quantum_probabilities, expected.quantum_probabilities)
+
+
+def test_coalescer_rejects_malformed_request_alone(trained_service):
+    async def run_batch(frame, horizon):
+        return trained_service.predict_pup_batch(frame, horizon)
+
+    async def run():
+        coalescer = PredictionCoalescer(run_batch)
+        bad = _sap_data().iloc[:3].assign(quantity="many").to_dict("records")
+        with pytest.raises(ValueError, match="quantity"):
+            await coalescer.submit(bad, ForecastHorizon.MONTHLY)
+        return await coalescer.submit(_sap_data().iloc[:3].to_dict("records"), ForecastHorizon.MONTHLY)
+
+    assert len(asyncio.run(run())) == 3
+
+
+def test_predict_rejected_when_inference_queue_full(tmp_path):
+    api = MLServiceAPI(artifact_dir=str(tmp_path), inference_workers=1, max_queue_depth=2)
+    try:
+        api.model_version = "test"
+        api._pending = api.max_queue_depth
+        with pytest.raises(Exception, match="Inference queue full"):
+            asyncio.run(api.predict_pup(_sap_data().iloc[:3].to_dict("records")))
+        assert api._pending == api.max_queue_depth
+    finally:
+        api.shutdown()